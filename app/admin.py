@@ -13,5 +13,9 @@ class CustomUserAdmin(UserAdmin):
         ('Custom Fields', {'fields': ('user_type', 'user_id')}),
     )
 
+class RoomAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'is_active', 'is_accepted', 'created_at']
+    list_select_related = ['creator', 'receiver']
+
 admin.site.register(CustomUser, CustomUserAdmin)
-admin.site.register(Room)
\ No newline at end of file
+admin.site.register(Room, RoomAdmin)
\ No newline at end of file
@@ -0,0 +1,196 @@
+"""
+Validation of JSON messages sent by clients over the room WebSocket.
+
+RoomConsumer only accepts the message types listed in VALIDATORS; each one is
+checked for the fields its handler and the receiving peer rely on before
+anything reaches the channel layer. Checks are plain type and size tests, so
+they cost far less than the group_send they may save. Extra fields are left
+alone and forwarded as sent.
+"""
+from django.conf import settings
+
+from . import codec
+from .protocol import BUTTONS
+
+# Group events that only the server may emit; clients must not be able to forge them
+SERVER_ONLY_MESSAGE_TYPES = {'room_state', 'user_connected', 'user_disconnected', 'presence'}
+
+MAX_SDP_LENGTH = 64 * 1024
+MAX_CANDIDATE_LENGTH = 1024
+MAX_FIELD_LENGTH = 256
+
+MOUSE_ACTIONS = {'move', 'down', 'up'}
+KEY_ACTIONS = {'down', 'up'}
+
+
+class InvalidMessage(ValueError):
+    """
+    A client message that must not be handled; `reason` labels the rejection
+    and `message_type` is set once the type is known to be valid
+    """
+    message_type = None
+
+    def __init__(self, reason, detail=''):
+        super().__init__(detail or reason)
+        self.reason = reason
+
+
+class UnsupportedEvent(InvalidMessage):
+    """
+    A well-formed input event the host cannot inject, such as the back and
+    forward mouse buttons; a batch drops it and keeps the rest
+    """
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def is_short_string(value, limit=MAX_FIELD_LENGTH):
+    return isinstance(value, str) and len(value) <= limit
+
+
+def validate_input_event(event):
+    if not isinstance(event, dict):
+        raise InvalidMessage('invalid', 'input event is not an object')
+    event_type = event.get('type')
+    action = event.get('action')
+    if event_type == 'mouse':
+        if action not in MOUSE_ACTIONS:
+            raise InvalidMessage('invalid', f'unknown mouse action {action!r}')
+        if action == 'move':
+            if not (is_number(event.get('x')) and is_number(event.get('y'))):
+                raise InvalidMessage('invalid', 'mouse move without numeric x and y')
+        else:
+            button = event.get('button')
+            # DOM MouseEvent.button numbers, in the order of protocol.BUTTONS
+            if isinstance(button, int) and not isinstance(button, bool) and 0 <= button < len(BUTTONS):
+                event['button'] = BUTTONS[button]
+            elif isinstance(button, int) and not isinstance(button, bool) and 0 <= button < 5:
+                raise UnsupportedEvent('invalid', f'mouse button {button} is not supported')
+            elif not is_short_string(button):
+                raise InvalidMessage('invalid', 'mouse button is not a name or 0-2')
+    elif event_type == 'keyboard':
+        if action not in KEY_ACTIONS:
+            raise InvalidMessage('invalid', f'unknown keyboard action {action!r}')
+        if not is_short_string(event.get('key')):
+            raise InvalidMessage('invalid', 'key is not a string')
+    else:
+        raise InvalidMessage('invalid', f'unknown input event type {event_type!r}')
+
+
+def validate_client_ts(data):
+    ts = data.get('ts')
+    if ts is not None and not is_number(ts):
+        raise InvalidMessage('invalid', 'ts is not a number')
+
+
+def validate_screen_data(data):
+    validate_client_ts(data)
+    validate_input_event(data.get('data'))
+
+
+def validate_screen_data_batch(data):
+    validate_client_ts(data)
+    events = data.get('events')
+    if not isinstance(events, list):
+        raise InvalidMessage('invalid', 'events is not a list')
+    if not events:
+        raise InvalidMessage('invalid', 'events is empty')
+    if len(events) > getattr(settings, 'REMOTE_INPUT_BATCH_MAX_EVENTS', 256):
+        raise InvalidMessage('invalid', f'batch of {len(events)} events is too large')
+    supported = []
+    for entry in events:
+        if not isinstance(entry, dict):
+            raise InvalidMessage('invalid', 'batch entry is not an object')
+        offset = entry.get('t', 0)
+        if not is_number(offset) or offset < 0:
+            raise InvalidMessage('invalid', 'batch offset is not a non-negative number')
+        # Dropping only the unsupported event keeps the key and button releases around it
+        try:
+            validate_input_event(entry.get('data'))
+        except UnsupportedEvent:
+            continue
+        supported.append(entry)
+    if not supported:
+        raise InvalidMessage('invalid', 'batch has no supported events')
+    data['events'] = supported
+
+
+def validate_description(data, kind):
+    description = data.get(kind)
+    if not isinstance(description, dict):
+        raise InvalidMessage('invalid', f'{kind} is not an object')
+    if description.get('type') != kind:
+        raise InvalidMessage('invalid', f'{kind} has type {description.get("type")!r}')
+    if not is_short_string(description.get('sdp'), MAX_SDP_LENGTH):
+        raise InvalidMessage('invalid', f'{kind} sdp is missing or too long')
+
+
+def validate_offer(data):
+    validate_description(data, 'offer')
+
+
+def validate_answer(data):
+    validate_description(data, 'answer')
+
+
+def validate_ice_candidate(data):
+    candidate = data.get('candidate')
+    # A null candidate (or an empty candidate string) marks the end of gathering
+    if candidate is None:
+        return
+    if not isinstance(candidate, dict):
+        raise InvalidMessage('invalid', 'candidate is not an object')
+    if not is_short_string(candidate.get('candidate', ''), MAX_CANDIDATE_LENGTH):
+        raise InvalidMessage('invalid', 'candidate is not a string or too long')
+    for field in ('sdpMid', 'usernameFragment'):
+        value = candidate.get(field)
+        if value is not None and not is_short_string(value):
+            raise InvalidMessage('invalid', f'{field} is not a string')
+    index = candidate.get('sdpMLineIndex')
+    if index is not None and (not isinstance(index, int) or isinstance(index, bool)):
+        raise InvalidMessage('invalid', 'sdpMLineIndex is not an integer')
+
+
+def validate_empty(data):
+    pass
+
+
+VALIDATORS = {
+    'screen_data': validate_screen_data,
+    'screen_data_batch': validate_screen_data_batch,
+    'ice_candidate': validate_ice_candidate,
+    'webrtc.offer': validate_offer,
+    'webrtc.answer': validate_answer,
+    'screen_ready': validate_empty,
+    'presence_query': validate_empty,
+}
+
+
+def parse_client_message(text_data):
+    """
+    Decode and validate a client text frame, returning (message_type, data).
+    Raises InvalidMessage with reason 'malformed', 'server_only', 'unknown_type' or 'invalid'.
+    """
+    try:
+        data = codec.loads(text_data)
+    except (TypeError, ValueError):
+        raise InvalidMessage('malformed', 'not valid JSON')
+    if not isinstance(data, dict):
+        raise InvalidMessage('malformed', 'not a JSON object')
+
+    message_type = data.get('type')
+    if not isinstance(message_type, str):
+        raise InvalidMessage('unknown_type', 'type is not a string')
+    validator = VALIDATORS.get(message_type)
+    if validator is None:
+        if message_type in SERVER_ONLY_MESSAGE_TYPES:
+            raise InvalidMessage('server_only', f'server-only type {message_type}')
+        raise InvalidMessage('unknown_type', f'unknown type {message_type[:64]!r}')
+    try:
+        validator(data)
+    except InvalidMessage as e:
+        e.message_type = message_type
+        raise
+    return message_type, data
@@ -0,0 +1,131 @@
+"""
+JSON encoding for WebSocket frames, channel layer envelopes and JSON views.
+
+Uses orjson or msgspec when one is installed and falls back to the standard
+library. REMOTE_JSON_CODEC can force one of CODECS by name; the default picks
+the fastest available. Every codec produces compact JSON and raises
+DecodeError, a ValueError, on invalid input.
+
+    dumps(obj)  -> str, for text WebSocket frames and envelope frames
+    dumpb(obj)  -> bytes, for HTTP response bodies
+    loads(data) -> object, from str or bytes
+"""
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class DecodeError(ValueError):
+    pass
+
+
+class StdlibCodec:
+    name = 'json'
+
+    def __init__(self):
+        self.encoder = DjangoJSONEncoder(separators=(',', ':'), ensure_ascii=False)
+        self.decoder = json.JSONDecoder()
+
+    def dumps(self, obj):
+        return self.encoder.encode(obj)
+
+    def dumpb(self, obj):
+        return self.encoder.encode(obj).encode()
+
+    def loads(self, data):
+        try:
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                data = bytes(data).decode()
+            return self.decoder.decode(data)
+        except ValueError as e:
+            raise DecodeError(str(e))
+
+
+class OrjsonCodec:
+    name = 'orjson'
+
+    def __init__(self):
+        self.options = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj):
+        return orjson.dumps(obj, option=self.options).decode()
+
+    def dumpb(self, obj):
+        return orjson.dumps(obj, option=self.options)
+
+    def loads(self, data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError as e:
+            raise DecodeError(str(e))
+
+
+class MsgspecCodec:
+    name = 'msgspec'
+
+    def __init__(self):
+        self.encoder = msgspec.json.Encoder()
+        self.decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj):
+        return self.encoder.encode(obj).decode()
+
+    def dumpb(self, obj):
+        return self.encoder.encode(obj)
+
+    def loads(self, data):
+        try:
+            return self.decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise DecodeError(str(e))
+
+
+CODECS = {
+    'orjson': OrjsonCodec if orjson is not None else None,
+    'msgspec': MsgspecCodec if msgspec is not None else None,
+    'json': StdlibCodec,
+}
+
+
+def available_codecs():
+    return [name for name, codec_class in CODECS.items() if codec_class is not None]
+
+
+def get_codec(name=None):
+    """
+    Return a codec by name, or the first available one in CODECS order
+    """
+    if name is None:
+        name = available_codecs()[0]
+    codec_class = CODECS.get(name)
+    if codec_class is None:
+        raise ValueError(f"JSON codec {name!r} is not available; installed: {', '.join(available_codecs())}")
+    return codec_class()
+
+
+codec = get_codec(getattr(settings, 'REMOTE_JSON_CODEC', None))
+dumps = codec.dumps
+dumpb = codec.dumpb
+loads = codec.loads
+
+
+class JsonResponse(HttpResponse):
+    """
+    django.http.JsonResponse encoded with the selected codec
+    """
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumpb(data), **kwargs)
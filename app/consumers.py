@@ -1,15 +1,57 @@
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-import json
 import logging
-import pyautogui
-from keyboard import press, release
 import asyncio
-from asgiref.sync import sync_to_async
+import time
+from django.conf import settings
 from django.db.models import Q
+from . import codec
+from .client_messages import InvalidMessage, parse_client_message
+from .injection import InputInjector
+from .input_backends import get_input_backend, input_injection_available
+from .input_latency import TIMING_KEY, InputTiming, get_input_latency_tracker, mark_enqueued
+from .input_pipeline import InputPipeline, is_pointer_move
+from . import metrics
+from .notifications import notification_group
+from .presence import get_presence_registry, presence_snapshot
+from .rate_limit import ALLOW, CLOSE, CLOSE_CODE, NOTIFY, event_class, get_rate_limiter, input_costs
+from .protocol import NAMED_KEYS, PROTOCOL_VERSION, SUBPROTOCOL, ProtocolError, decode_message
+from .room_cache import get_room_membership
+from .signaling import encode_envelope, envelope_frame, get_signaling_state
 
 logger = logging.getLogger(__name__)
 
+_injector = None
+
+
+def get_injector():
+    """
+    Return the process-wide input injection worker, creating it on first use
+    """
+    global _injector
+    if _injector is None:
+        _injector = InputInjector(
+            process_screen_data,
+            maxsize=getattr(settings, 'REMOTE_INPUT_QUEUE_SIZE', 256),
+            max_move_age=getattr(settings, 'REMOTE_INPUT_MAX_MOVE_AGE', 0.25),
+            max_batch_delay=getattr(settings, 'REMOTE_INPUT_BATCH_MAX_DELAY', 0.1)
+        )
+    return _injector
+
+
+def process_screen_data(data):
+    """
+    Process screen control data synchronously on the injection worker thread
+    """
+    timing = data.get(TIMING_KEY)
+    if not isinstance(timing, InputTiming):
+        get_input_backend().inject(data)
+        return
+    started = time.monotonic()
+    get_input_backend().inject(data)
+    get_input_latency_tracker().observe(timing, started, time.monotonic())
+
+
 class RoomConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         try:
@@ -28,26 +70,82 @@ class RoomConsumer(AsyncWebsocketConsumer):
                 await self.close()
                 return
             
+            # Decide control permission once; room_state events invalidate it
+            self.can_control = await self.verify_control_permission()
+
+            # Signaling goes straight to the other party once we know its channel
+            self.role = 'creator' if self.room.creator_id == self.user.id else 'receiver'
+            self.peer_role = 'receiver' if self.role == 'creator' else 'creator'
+            self.peer_channel = None
+
+            # Trickled ICE candidates are collected briefly and forwarded as one batch
+            self.ice_pending = []
+            self.ice_seen = set()
+            self.ice_flush_task = None
+
             # Add to room group
             await self.channel_layer.group_add(
                 self.room_id,
                 self.channel_name
             )
             
-            await self.accept()
+            # Clients that offer the binary input subprotocol may send input as bytes
+            self.binary_input = SUBPROTOCOL in self.scope.get('subprotocols', [])
+            await self.accept(subprotocol=SUBPROTOCOL if self.binary_input else None)
+            metrics.get_publisher()
+            metrics.websocket_connections.inc(consumer='room')
+            self.counted_connection = True
             logger.info(f"User {self.user.id} connected to room {self.room_id}")
+
+            if self.binary_input:
+                await self.send_json({
+                    'type': 'input_protocol',
+                    'version': PROTOCOL_VERSION,
+                    'named_keys': NAMED_KEYS
+                })
+
+            # Nodes that cannot inject (no display, signaling only) accept no input
+            self.input_latency = get_input_latency_tracker()
+            self.rejected_messages = 0
+            self.rate_limiter = get_rate_limiter()
+            self.rate_limit_closing = False
+            self.input_pipeline = None
+            if input_injection_available():
+                self.input_pipeline = InputPipeline(
+                    self.enqueue_input,
+                    move_rate=getattr(settings, 'REMOTE_INPUT_MOVE_RATE', 120)
+                )
+                self.input_pipeline.start()
             
-            # Notify others about connection
-            await self.channel_layer.group_send(
-                self.room_id,
-                {
+            # Register before looking for the peer: if both sides connect at
+            # once, at least one of them is guaranteed to see the other
+            self.presence = get_presence_registry(self.channel_layer)
+            await self.presence.join(self.room_id, self.role, self.user.user_id, self.channel_name)
+            members = await self.presence.members(self.room_id)
+            await self.send_json(presence_snapshot(self.room_id, members))
+
+            # Only an online peer is told about us, straight to its channel
+            peer = members.get(self.peer_role)
+            if peer is not None:
+                self.peer_channel = peer['channel_name']
+                await self.channel_layer.send(self.peer_channel, {
                     "type": "user_connected",
                     "user_id": str(self.user.user_id),
-                    "room_id": self.room_id
-                }
+                    "room_id": self.room_id,
+                    "role": self.role,
+                    "channel_name": self.channel_name
+                })
+            self.presence_task = asyncio.ensure_future(self.presence_heartbeat())
+
+            # Bring a (re)joining peer up to date with the negotiation so far
+            frames = await self.remember_signaling(
+                get_signaling_state().replay_frames(self.room_id, self.role)
             )
+            for frame in frames or []:
+                await self.send(text_data=frame)
             
         except Exception as e:
+            metrics.errors.inc(where='consumer_connect')
             logger.error(f"Connection error in room {self.room_id}: {str(e)}")
             await self.close()
             return
@@ -56,130 +154,328 @@ class RoomConsumer(AsyncWebsocketConsumer):
         """
         Handle WebSocket disconnection
         """
+        if getattr(self, 'counted_connection', False):
+            metrics.websocket_connections.dec(consumer='room')
+            self.counted_connection = False
         try:
             logger.info(f"Disconnecting from room: {self.room_id}")
+            # Candidates still waiting for their batch window go out now
+            if getattr(self, 'ice_pending', None):
+                await self.flush_ice_candidates()
+            elif getattr(self, 'ice_flush_task', None) is not None:
+                self.ice_flush_task.cancel()
+            presence_task = getattr(self, 'presence_task', None)
+            if presence_task is not None:
+                presence_task.cancel()
+                await self.presence.leave(self.room_id, self.role, self.channel_name)
+            rate_limiter = getattr(self, 'rate_limiter', None)
+            if rate_limiter is not None and rate_limiter.dropped:
+                logger.warning(
+                    f"Dropped {rate_limiter.dropped} messages over the rate limit from user {self.user.id} "
+                    f"in room {self.room_id}"
+                )
+            if getattr(self, 'rejected_messages', 0):
+                logger.warning(
+                    f"Rejected {self.rejected_messages} invalid messages from user {self.user.id} "
+                    f"in room {self.room_id}"
+                )
+            input_pipeline = getattr(self, 'input_pipeline', None)
+            if input_pipeline is not None:
+                await input_pipeline.stop()
+                stats = input_pipeline.stats()
+                logger.info(
+                    f"Input pipeline for room {self.room_id}: "
+                    f"{stats['processed']} events forwarded, {stats['coalesced']} moves coalesced; "
+                    f"injector {get_injector().stats()}"
+                )
             await self.channel_layer.group_discard(
                 self.room_id,
                 self.channel_name
             )
             
-            # Notify room members about disconnection
-            await self.channel_layer.group_send(
-                self.room_id,
-                {
+            # Only a known peer needs to hear about it; nobody else is listening
+            peer_channel = getattr(self, 'peer_channel', None)
+            if peer_channel:
+                await self.channel_layer.send(peer_channel, {
                     "type": "user_disconnected",
                     "user_id": str(self.user.user_id),
-                    "room_id": self.room_id
-                }
-            )
+                    "room_id": self.room_id,
+                    "channel_name": self.channel_name
+                })
             
         except Exception as e:
+            metrics.errors.inc(where='consumer_disconnect')
             logger.error(f"Error in disconnect for room {self.room_id}: {str(e)}")
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
+        received = time.monotonic() if self.input_latency is not None else None
+        if bytes_data is not None:
+            metrics.consumer_messages.inc(type='binary_input')
+            await self.receive_input_frame(bytes_data, received)
+            return
+
         try:
-            data = json.loads(text_data)
-            message_type = data.get('type')
-            
-            # Forward all messages to the group except screen_data
-            if message_type != 'screen_data':
-                await self.channel_layer.group_send(
-                    self.room_id,
-                    {
-                        'type': message_type,
-                        **data,
-                        'sender_id': str(self.user.user_id)
-                    }
-                )
-            elif message_type == 'screen_data':
-                if await self.verify_control_permission():
-                    await self.process_screen_data(data.get('data', {}))
-                
+            message_type, data = parse_client_message(text_data)
+        except InvalidMessage as e:
+            self.reject_message(e)
+            await self.within_rate_limit({'signaling': 1})
+            return
+
+        if self.rate_limiter is not None:
+            if message_type == 'screen_data':
+                costs = {event_class(data['data']): 1}
+            elif message_type == 'screen_data_batch':
+                costs = input_costs((0, entry['data']) for entry in data['events'])
+            else:
+                costs = {'signaling': 1}
+            if not await self.within_rate_limit(costs):
+                return
+
+        metrics.consumer_messages.inc(type=message_type)
+        try:
+            await self.message_handlers[message_type](self, data, received)
         except Exception as e:
+            metrics.errors.inc(where='consumer_receive')
             logger.error(f"Error in receive: {str(e)}")
 
-    
+
+    async def receive_input_frame(self, frame, received=None):
+        """
+        Handle a binary input frame negotiated through the input subprotocol
+        """
+        if not self.binary_input:
+            logger.warning(f"Binary frame from user {self.user.id} without negotiated subprotocol")
+            await self.within_rate_limit({'signaling': 1})
+            return
+        try:
+            events = decode_message(frame)
+        except ProtocolError as e:
+            logger.warning(f"Invalid input frame from user {self.user.id}: {str(e)}")
+            await self.within_rate_limit({'signaling': 1})
+            return
+        if self.rate_limiter is not None and not await self.within_rate_limit(input_costs(events)):
+            return
+        if len(events) == 1:
+            if await self.has_control_permission():
+                if received is not None:
+                    self.track_input(events, received)
+                self.input_pipeline.submit(events[0][1])
+        else:
+            await self.submit_input_batch(events, received)
+
+    def track_input(self, events, received, client_ts=None):
+        """
+        Attach one latency timing, stamped as authorized now, to authorized input events
+        """
+        timing = InputTiming(self.room_id, received, client_ts)
+        timing.authorized = time.monotonic()
+        for _, event in events:
+            event[TIMING_KEY] = timing
+
+    async def submit_input_batch(self, events, received=None, client_ts=None):
+        """
+        Queue a client batch of (offset_ms, event) pairs for injection in one executor call
+        """
+        max_events = getattr(settings, 'REMOTE_INPUT_BATCH_MAX_EVENTS', 256)
+        if len(events) > max_events:
+            logger.warning(f"Dropping input batch of {len(events)} events from user {self.user.id}")
+            return
+        if not await self.has_control_permission():
+            return
+        if received is not None:
+            self.track_input(events, received, client_ts)
+
+        max_span = getattr(settings, 'REMOTE_INPUT_BATCH_MAX_SPAN', 0.25)
+        self.input_pipeline.submit_batch(
+            [(min(offset / 1000, max_span), data) for offset, data in events],
+            preserve_timing=getattr(settings, 'REMOTE_INPUT_BATCH_TIMING', 'compress') == 'preserve'
+        )
+
     async def screen_ready(self, event):
         """Handle screen ready notification"""
         if str(self.user.user_id) != event.get('sender_id'):
-            await self.send(text_data=json.dumps(event))
+            await self.send(text_data=envelope_frame(event))
 
 
-    async def handle_webrtc_offer(self, data):
+    async def send_json(self, content):
         """
-        Handle WebRTC offer messages
+        Send a server message as a text frame encoded with the fast codec
         """
-        await self.channel_layer.group_send(
-            self.room_id,
-            {
-                'type': 'webrtc.offer',
-                'offer': data['offer'],
-                'roomId': self.room_id,
-                'sender_id': str(self.user.user_id)
-            }
-        )
+        await self.send(text_data=codec.dumps(content))
 
-    async def handle_webrtc_answer(self, data):
+    async def within_rate_limit(self, costs):
         """
-        Handle WebRTC answer messages
+        Take rate limit tokens for a message; on failure the message is dropped
+        and the client gets a throttle notice or, if it keeps flooding, a close
         """
-        await self.channel_layer.group_send(
-            self.room_id,
-            {
-                'type': 'webrtc.answer',
-                'answer': data['answer'],
-                'roomId': self.room_id,
-                'sender_id': str(self.user.user_id)
-            }
-        )
+        if self.rate_limiter is None:
+            return True
+        decision = self.rate_limiter.check_costs(costs)
+        if decision == ALLOW:
+            return True
+        metrics.throttled_messages.inc(message_class=self.rate_limiter.limited)
+        if decision == NOTIFY:
+            await self.send_json(self.rate_limiter.notice())
+        elif decision == CLOSE and not self.rate_limit_closing:
+            self.rate_limit_closing = True
+            logger.warning(
+                f"Closing connection of user {self.user.id} in room {self.room_id}: "
+                f"{self.rate_limiter.dropped} messages over the rate limit"
+            )
+            await self.close(code=CLOSE_CODE)
+        return False
+
+    def reject_message(self, error):
+        """
+        Count a client message that failed validation instead of handling it
+        """
+        self.rejected_messages += 1
+        metrics.rejected_messages.inc(type=error.message_type or 'other', reason=error.reason)
+        logger.debug(f"Rejected message from user {self.user.id} in room {self.room_id}: {str(error)}")
 
-    async def handle_ice_candidate(self, data):
+    async def handle_screen_data(self, data, received=None):
+        """
+        Handle a single input event
+        """
+        if await self.has_control_permission():
+            event = data['data']
+            if received is not None:
+                self.track_input([(0, event)], received, data.get('ts'))
+            self.input_pipeline.submit(event)
+
+    async def handle_screen_data_batch(self, data, received=None):
+        """
+        Handle a client batch of input events
+        """
+        events = [(event.get('t', 0), event['data']) for event in data['events']]
+        await self.submit_input_batch(events, received, data.get('ts'))
+
+    async def handle_ice_candidate(self, data, received=None):
         """
         Handle ICE candidate messages
         """
-        await self.channel_layer.group_send(
-            self.room_id,
-            {
-                'type': 'ice_candidate',
-                'candidate': data['candidate'],
-                'roomId': self.room_id,
-                'sender_id': str(self.user.user_id)
-            }
-        )
+        await self.queue_ice_candidate(data.get('candidate'))
 
-    async def handle_screen_data(self, data):
+    async def handle_presence_query(self, data, received=None):
         """
-        Handle screen control data messages
+        Answer with the current presence snapshot of the room
         """
-        screen_data = data.get('data', {})
-        try:
-            if await self.verify_control_permission():
-                await self.process_screen_data(screen_data)
-            else:
-                logger.warning(f"Unauthorized screen control attempt from user: {self.user.user_id}")
-        except Exception as e:
-            logger.error(f"Error processing screen data: {str(e)}")
+        members = await self.presence.members(self.room_id)
+        await self.send_json(presence_snapshot(self.room_id, members))
+
+    async def handle_peer_message(self, data, received=None):
+        """
+        Forward offers, answers and screen_ready to the peer
+        """
+        message_type = data['type']
+        # Keep candidates ahead of anything the client sent after them
+        await self.flush_ice_candidates()
+        # Either description starts this side's candidates for a new exchange
+        if message_type in ('webrtc.offer', 'webrtc.answer'):
+            self.ice_seen.clear()
+        payload = {
+            **data,
+            'sender_id': str(self.user.user_id)
+        }
+        event = encode_envelope(payload)
+        # Record first, so an answer is never recorded ahead of its offer
+        if message_type in ('webrtc.offer', 'webrtc.answer'):
+            await self.remember_signaling(
+                get_signaling_state().record_description(self.room_id, self.role, payload, event['frame'])
+            )
+        await self.send_to_peer(event)
+
+    # Handlers for the client message types of client_messages.VALIDATORS,
+    # looked up once per message; everything else is rejected before dispatch
+    message_handlers = {
+        'screen_data': handle_screen_data,
+        'screen_data_batch': handle_screen_data_batch,
+        'ice_candidate': handle_ice_candidate,
+        'presence_query': handle_presence_query,
+        'webrtc.offer': handle_peer_message,
+        'webrtc.answer': handle_peer_message,
+        'screen_ready': handle_peer_message,
+    }
+
+    async def queue_ice_candidate(self, candidate):
+        """
+        Collect a trickled ICE candidate for the next batch, dropping duplicates.
+        A null or empty candidate marks the end of gathering and flushes at once.
+        """
+        if not candidate or not candidate.get('candidate'):
+            await self.flush_ice_candidates(end_of_candidates=True)
+            return
+
+        if candidate['candidate'] in self.ice_seen:
+            return
+        self.ice_seen.add(candidate['candidate'])
+        self.ice_pending.append(candidate)
+
+        if self.ice_flush_task is None:
+            self.ice_flush_task = asyncio.ensure_future(self.flush_ice_candidates_later())
+
+    async def flush_ice_candidates_later(self):
+        await asyncio.sleep(getattr(settings, 'REMOTE_ICE_BATCH_WINDOW', 0.05))
+        self.ice_flush_task = None
+        await self.flush_ice_candidates()
 
-    @sync_to_async
-    def process_screen_data(self, data):
+    async def flush_ice_candidates(self, end_of_candidates=False):
         """
-        Process screen control data synchronously
+        Send the pending ICE candidates to the peer as a single ice_candidates message
+        """
+        if self.ice_flush_task is not None:
+            self.ice_flush_task.cancel()
+            self.ice_flush_task = None
+        if not self.ice_pending and not end_of_candidates:
+            return
+
+        candidates, self.ice_pending = self.ice_pending, []
+        await self.send_to_peer(encode_envelope({
+            'type': 'ice_candidates',
+            'candidates': candidates,
+            'end_of_candidates': end_of_candidates,
+            'roomId': self.room_id,
+            'sender_id': str(self.user.user_id)
+        }))
+        if candidates:
+            await self.remember_signaling(
+                get_signaling_state().record_candidates(self.room_id, self.role, candidates)
+            )
+
+    async def remember_signaling(self, operation):
+        """
+        Run a signaling state cache operation; cache failures must not break signaling
         """
         try:
-            if data["type"] == "mouse":
-                if data["action"] == "move":
-                    pyautogui.moveTo(data["x"], data["y"])
-                elif data["action"] == "down":
-                    pyautogui.mouseDown(button=data["button"])
-                elif data["action"] == "up":
-                    pyautogui.mouseUp(button=data["button"])
-            elif data["type"] == "keyboard":
-                if data["action"] == "down":
-                    press(data["key"])
-                elif data["action"] == "up":
-                    release(data["key"])
+            return await operation
         except Exception as e:
-            logger.error(f"Error in process_screen_data: {str(e)}")
+            metrics.errors.inc(where='signaling_state')
+            logger.error(f"Signaling state cache error in room {self.room_id}: {str(e)}")
+
+    async def enqueue_input(self, data):
+        """
+        Hand an input event to the injection worker without blocking the event loop.
+        Moves are awaited so the pipeline keeps coalescing while injection is busy.
+        """
+        if self.input_latency is not None:
+            mark_enqueued(data)
+        future = get_injector().submit(data)
+        if is_pointer_move(data):
+            await asyncio.wrap_future(future)
+
+    async def has_control_permission(self):
+        """
+        Return the cached control permission, recomputing it if it was invalidated
+        """
+        if self.input_pipeline is None:
+            return False
+        if self.can_control is None:
+            self.room = await self.get_room()
+            self.can_control = bool(self.room) and await self.verify_control_permission()
+        return self.can_control
+
+    def invalidate_control_permission(self):
+        self.can_control = None
 
     @database_sync_to_async
     def verify_control_permission(self):
@@ -187,15 +483,32 @@ class RoomConsumer(AsyncWebsocketConsumer):
         Verify if user has permission to control the screen
         """
         try:
-            return (self.room.creator == self.user or 
-                   self.room.receiver == self.user and 
+            return (self.room.creator_id == self.user.id or
+                   self.room.receiver_id == self.user.id and
                    self.room.is_accepted)
         except Exception as e:
             logger.error(f"Error verifying control permission: {str(e)}")
             return False
 
+    async def get_room(self):
+        """
+        Authorize against the room membership cache, falling back to the database
+        """
+        from .models import Room
+        entry = await get_room_membership().aget(self.room_id)
+        if entry is None:
+            room = await self.fetch_room()
+            if room is not None:
+                await get_room_membership().astore(room)
+            return room
+
+        if (entry['is_active'] and entry['is_accepted'] and
+                self.user.id in (entry['creator_id'], entry['receiver_id'])):
+            return Room(room_id=self.room_id, **entry)
+        return None
+
     @database_sync_to_async
-    def get_room(self):
+    def fetch_room(self):
         from .models import Room
         try:
             return Room.objects.get(
@@ -210,38 +523,122 @@ class RoomConsumer(AsyncWebsocketConsumer):
             logger.error(f"Error getting room: {str(e)}")
             return None
 
+    async def room_state(self, event):
+        """
+        Handle room state changes pushed by accept_room, reject_room and end_room
+        """
+        if not event.get('is_active', True):
+            self.can_control = False
+            await self.remember_signaling(get_signaling_state().clear(self.room_id))
+            await self.close()
+            return
+        self.invalidate_control_permission()
+
     # WebRTC message handlers
     async def webrtc_offer(self, event):
         if str(self.user.user_id) != event.get('sender_id'):
-            await self.send(text_data=json.dumps(event))
+            await self.send(text_data=envelope_frame(event))
 
 
     async def webrtc_answer(self, event):
         if str(self.user.user_id) != event.get('sender_id'):
-            await self.send(text_data=json.dumps(event))
+            await self.send(text_data=envelope_frame(event))
 
     async def ice_candidate(self, event):
         if str(self.user.user_id) != event.get('sender_id'):
-            await self.send(text_data=json.dumps(event))
+            await self.send(text_data=envelope_frame(event))
+
+    async def ice_candidates(self, event):
+        if str(self.user.user_id) != event.get('sender_id'):
+            await self.send(text_data=envelope_frame(event))
+
+    async def send_to_peer(self, event):
+        """
+        Deliver an event to the other party in the room. Falls back to the room
+        group until the peer's channel is known; handlers still drop their own echo.
+        """
+        peer_channel = getattr(self, 'peer_channel', None)
+        if peer_channel:
+            with metrics.channel_layer_seconds.time(operation='send'):
+                await self.channel_layer.send(peer_channel, event)
+        else:
+            with metrics.channel_layer_seconds.time(operation='group_send'):
+                await self.channel_layer.group_send(self.room_id, event)
+
+    async def presence_heartbeat(self):
+        """
+        Keep this connection's presence entry fresh; if the worker dies the
+        entry simply expires
+        """
+        interval = self.presence.ttl / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.presence.join(self.room_id, self.role, self.user.user_id, self.channel_name)
+                await self.refresh_peer_channel()
+            except Exception as e:
+                metrics.errors.inc(where='presence_heartbeat')
+                logger.error(f"Error refreshing presence in room {self.room_id}: {str(e)}")
+
+    async def refresh_peer_channel(self):
+        """
+        Follow the peer's presence entry. A peer that left without a
+        user_disconnected (an HTTP poller that stopped polling, a dead worker)
+        drops out here once its entry expires, and messages go back to the group.
+        """
+        peer = await self.presence.get(self.room_id, self.peer_role)
+        peer_channel = peer['channel_name'] if peer is not None else None
+        if peer_channel != self.peer_channel:
+            logger.info(f"Peer channel in room {self.room_id} changed from {self.peer_channel} to {peer_channel}")
+            self.peer_channel = peer_channel
 
     async def user_connected(self, event):
         """
-        Handle user connection notification
+        The peer connected and found us in the presence registry
         """
+        if event.get('channel_name') and event.get('role') != self.role:
+            self.peer_channel = event['channel_name']
         if str(self.user.user_id) != event.get('user_id'):
-            await self.send(text_data=json.dumps({
+            await self.send_json({
                 'type': 'user_connected',
                 'user_id': event['user_id'],
                 'room_id': event['room_id']
-            }))
+            })
 
     async def user_disconnected(self, event):
         """
         Handle user disconnection notification
         """
+        if event.get('channel_name') == self.peer_channel:
+            self.peer_channel = None
         if str(self.user.user_id) != event.get('user_id'):
-            await self.send(text_data=json.dumps({
+            await self.send_json({
                 'type': 'user_disconnected',
                 'user_id': event['user_id'],
                 'room_id': event['room_id']
-            }))
\ No newline at end of file
+            })
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Pushes dashboard deltas (new invitations, room state changes) to a single
+    user so the dashboard updates without being reloaded
+    """
+
+    async def connect(self):
+        self.user = self.scope["user"]
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+
+        self.group_name = notification_group(self.user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        metrics.websocket_connections.inc(consumer='notifications')
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            metrics.websocket_connections.dec(consumer='notifications')
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def dashboard_event(self, event):
+        await self.send(text_data=event['frame'])
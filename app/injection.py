@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from . import metrics
+from .input_pipeline import is_batch, is_pointer_move
+
+logger = logging.getLogger(__name__)
+
+
+class InputInjector:
+    """
+    Dedicated worker thread that owns every OS input call.
+
+    Events are injected strictly in submission order from one thread, so key
+    down/up pairs can never be reordered and pyautogui never has to wait behind
+    ORM work on Django's thread-sensitive executor. The queue is bounded for
+    pointer moves: when it is full the oldest move that a later queued move
+    replaces is evicted, and moves that waited longer than `max_move_age`
+    seconds are skipped as stale when the next queued event is another move.
+    The last move before a button, key or batch is always injected, however
+    old, so a click lands where the pointer was when it was pressed. Button and
+    key events, and batches containing them, are never dropped.
+
+    A batch that keeps its timing is replayed by sleeping on this thread, which
+    holds up every other room's input meanwhile, so one batch sleeps for at most
+    `max_batch_delay` seconds in total; events due later are injected at once.
+    """
+
+    def __init__(self, inject, maxsize=256, max_move_age=0.25, max_batch_delay=0.1):
+        self.inject = inject
+        self.maxsize = maxsize
+        self.max_move_age = max_move_age
+        self.max_batch_delay = max_batch_delay
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self.submitted = 0
+        self.injected = 0
+        self.dropped_moves = 0
+        self.stale_moves = 0
+        self.overflows = 0
+        self.errors = 0
+        self.high_watermark = 0
+
+    def submit(self, data):
+        """
+        Queue an event for injection and return a Future that resolves to
+        True once it was injected, or False if it was dropped.
+        """
+        future = Future()
+        with self._cond:
+            self.submitted += 1
+            if len(self._items) >= self.maxsize and not self._evict_replaced_move(data):
+                self.overflows += 1
+            self._items.append((time.monotonic(), data, future))
+            self.high_watermark = max(self.high_watermark, len(self._items))
+            self._ensure_worker()
+            self._cond.notify()
+        return future
+
+    def stats(self):
+        with self._cond:
+            return {
+                'queued': len(self._items),
+                'high_watermark': self.high_watermark,
+                'submitted': self.submitted,
+                'injected': self.injected,
+                'dropped_moves': self.dropped_moves,
+                'stale_moves': self.stale_moves,
+                'overflows': self.overflows,
+                'errors': self.errors,
+            }
+
+    def _evict_replaced_move(self, incoming):
+        """
+        Drop the oldest queued move that is directly followed by another move,
+        counting `incoming` as the event after the last queued one
+        """
+        following = [data for _, data, _ in self._items][1:] + [incoming]
+        for index, ((_, data, future), next_data) in enumerate(zip(self._items, following)):
+            if is_pointer_move(data) and is_pointer_move(next_data):
+                del self._items[index]
+                self.dropped_moves += 1
+                future.set_result(False)
+                return True
+        return False
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name='input-injector', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._items:
+                    self._cond.wait()
+                enqueued_at, data, future = self._items.popleft()
+                replaced = bool(self._items) and is_pointer_move(self._items[0][1])
+
+            if replaced and is_pointer_move(data) and time.monotonic() - enqueued_at > self.max_move_age:
+                self.stale_moves += 1
+                future.set_result(False)
+                continue
+
+            if is_batch(data):
+                future.set_result(self._inject_batch(data))
+            else:
+                future.set_result(self._inject(data))
+
+    def _inject(self, data):
+        try:
+            self.inject(data)
+            self.injected += 1
+            return True
+        except Exception as e:
+            self.errors += 1
+            metrics.errors.inc(where='input_injection')
+            logger.error(f"Error injecting input event: {str(e)}")
+            return False
+
+    def _inject_batch(self, batch):
+        """
+        Replay a batch in order, sleeping between events when it keeps its
+        timing, for no more than max_batch_delay seconds in total
+        """
+        started_at = time.monotonic()
+        ok = True
+        for offset, data in batch['events']:
+            if batch['preserve_timing']:
+                delay = started_at + min(offset, self.max_batch_delay) - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            ok = self._inject(data) and ok
+        return ok
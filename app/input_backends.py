@@ -0,0 +1,189 @@
+"""
+Input injection backends.
+
+The injection worker hands every screen_data event to one backend, chosen by
+the REMOTE_INPUT_BACKEND setting (a dotted path):
+
+    PyAutoGUIBackend   pyautogui for the pointer, keyboard for keys, with
+                       pyautogui's default 0.1 s PAUSE after every call disabled
+    DirectBackend      calls pyautogui's platform layer directly, skipping the
+                       fail-safe corner check, pause and tweening bookkeeping
+                       that the public API runs on every call
+    RecordingBackend   keeps events in memory; for headless tests and benchmarks
+
+GUI modules are imported when a backend is created, not when this module is,
+and input_injection_available() decides whether this process injects at all
+without importing them, so signaling-only nodes start headless and fast.
+"""
+import importlib.util
+import logging
+import os
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class InputBackend:
+    """
+    Turns screen_data event dicts into OS input. Subclasses implement the
+    five primitive operations; inject() is called on the injection worker thread.
+    """
+
+    @classmethod
+    def check(cls):
+        """
+        Return None if the backend can run in this process, otherwise the reason it cannot
+        """
+        return None
+
+    def inject(self, data):
+        if data["type"] == "mouse":
+            if data["action"] == "move":
+                self.move(data["x"], data["y"])
+            elif data["action"] == "down":
+                self.mouse_down(data["button"])
+            elif data["action"] == "up":
+                self.mouse_up(data["button"])
+        elif data["type"] == "keyboard":
+            if data["action"] == "down":
+                self.key_down(data["key"])
+            elif data["action"] == "up":
+                self.key_up(data["key"])
+
+    def move(self, x, y):
+        raise NotImplementedError
+
+    def mouse_down(self, button):
+        raise NotImplementedError
+
+    def mouse_up(self, button):
+        raise NotImplementedError
+
+    def key_down(self, key):
+        raise NotImplementedError
+
+    def key_up(self, key):
+        raise NotImplementedError
+
+
+class PyAutoGUIBackend(InputBackend):
+    @classmethod
+    def check(cls):
+        for module in ('pyautogui', 'keyboard'):
+            if importlib.util.find_spec(module) is None:
+                return f"{module} is not installed"
+        if sys.platform.startswith('linux') and not os.environ.get('DISPLAY'):
+            return "no X display (DISPLAY is not set)"
+        return None
+
+    def __init__(self):
+        import keyboard
+        import pyautogui
+
+        # Each event is one call; pacing is the input pipeline's job, not a fixed sleep
+        pyautogui.PAUSE = 0
+        self.pyautogui = pyautogui
+        self.keyboard = keyboard
+
+    def move(self, x, y):
+        self.pyautogui.moveTo(x, y)
+
+    def mouse_down(self, button):
+        self.pyautogui.mouseDown(button=button)
+
+    def mouse_up(self, button):
+        self.pyautogui.mouseUp(button=button)
+
+    def key_down(self, key):
+        self.keyboard.press(key)
+
+    def key_up(self, key):
+        self.keyboard.release(key)
+
+
+class DirectBackend(PyAutoGUIBackend):
+    """
+    Lowest-latency backend: pointer events go straight to pyautogui's platform
+    module (Xlib/XTest, Quartz or SendInput). The pointer position is tracked
+    locally so button events need no position query.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.platform = self.pyautogui.platformModule
+        self.x, self.y = self.platform._position()
+
+    def move(self, x, y):
+        self.x, self.y = x, y
+        self.platform._moveTo(x, y)
+
+    def mouse_down(self, button):
+        self.platform._mouseDown(self.x, self.y, button)
+
+    def mouse_up(self, button):
+        self.platform._mouseUp(self.x, self.y, button)
+
+
+class RecordingBackend(InputBackend):
+    """
+    Records (monotonic time, event) pairs instead of injecting them.
+    `cost` seconds of busy time per event can stand in for a real backend.
+    """
+
+    def __init__(self, cost=0.0):
+        self.cost = cost
+        self.events = []
+        self._lock = threading.Lock()
+
+    def inject(self, data):
+        if self.cost:
+            deadline = time.perf_counter() + self.cost
+            while time.perf_counter() < deadline:
+                pass
+        with self._lock:
+            self.events.append((time.monotonic(), data))
+
+    def clear(self):
+        with self._lock:
+            self.events = []
+
+
+_input_backend = None
+_input_available = None
+
+
+def get_backend_class():
+    return import_string(getattr(settings, 'REMOTE_INPUT_BACKEND', 'app.input_backends.PyAutoGUIBackend'))
+
+
+def input_injection_available():
+    """
+    Return whether this process can inject input, checked once without
+    importing any GUI module. REMOTE_INPUT_ENABLED = False turns injection
+    off outright for signaling-only nodes.
+    """
+    global _input_available
+    if _input_available is None:
+        if not getattr(settings, 'REMOTE_INPUT_ENABLED', True):
+            _input_available = False
+        else:
+            reason = get_backend_class().check()
+            if reason is not None:
+                logger.warning(f"Input injection disabled: {reason}")
+            _input_available = reason is None
+    return _input_available
+
+
+def get_input_backend():
+    """
+    Return the process-wide input backend configured by REMOTE_INPUT_BACKEND
+    """
+    global _input_backend
+    if _input_backend is None:
+        _input_backend = get_backend_class()()
+    return _input_backend
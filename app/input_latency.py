@@ -0,0 +1,154 @@
+"""
+Latency of the remote-input path, from the browser to the injected event.
+
+When REMOTE_INPUT_LATENCY is on, RoomConsumer attaches an InputTiming to each
+input event under TIMING_KEY and stamps it as the event moves along:
+
+    received    RoomConsumer.receive got the WebSocket message
+    authorized  the control permission check passed
+    enqueued    the input pipeline handed the event to the injection worker
+    inject start / inject end   around the backend call on the worker thread
+
+JSON messages may carry `ts`, the client's Date.now() when it was sent, which
+adds a client-to-server stage (only meaningful with synchronized clocks).
+After injection the stage durations go into fixed-bucket histograms per room.
+Everything is recorded on the single injection worker thread, so observing
+takes no lock. When the setting is off no timing object is ever created.
+"""
+import bisect
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+TIMING_KEY = '_timing'
+STAGES = ('client', 'authorize', 'pipeline', 'injector_queue', 'inject', 'total')
+
+# Bucket upper bounds in seconds: 10 us to ~20 s, growing by 25% per bucket
+BUCKET_BOUNDS = [1e-5 * 1.25 ** i for i in range(66)]
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        """
+        Upper bound of the bucket holding the given fraction of observations
+        """
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1e3, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.50) * 1e3, 3),
+            'p95_ms': round(self.percentile(0.95) * 1e3, 3),
+            'p99_ms': round(self.percentile(0.99) * 1e3, 3),
+            'max_ms': round(self.max * 1e3, 3),
+        }
+
+
+class InputTiming:
+    __slots__ = ('room_id', 'client_delay', 'received', 'authorized', 'enqueued')
+
+    def __init__(self, room_id, received, client_ts=None):
+        self.room_id = room_id
+        self.received = received
+        # Client and server wall clocks; skew can make this negative, so clamp it
+        self.client_delay = None
+        if isinstance(client_ts, (int, float)):
+            self.client_delay = max(0.0, time.time() - client_ts / 1000)
+        self.authorized = None
+        self.enqueued = None
+
+
+def mark_enqueued(data):
+    """
+    Stamp the hand-off to the injection worker on an event or on every event of a batch
+    """
+    events = data['events'] if data.get('type') == 'batch' else [(0, data)]
+    now = time.monotonic()
+    for _, event in events:
+        timing = event.get(TIMING_KEY)
+        if isinstance(timing, InputTiming) and timing.enqueued is None:
+            timing.enqueued = now
+
+
+class InputLatencyTracker:
+    """
+    Per-room stage histograms for the `max_rooms` most recently active rooms
+    """
+
+    def __init__(self, max_rooms=256):
+        self.max_rooms = max_rooms
+        self.rooms = OrderedDict()
+
+    def histograms(self, room_id):
+        stages = self.rooms.get(room_id)
+        if stages is None:
+            stages = self.rooms[room_id] = {stage: LatencyHistogram() for stage in STAGES}
+            while len(self.rooms) > self.max_rooms:
+                self.rooms.popitem(last=False)
+        else:
+            # Least recently used rooms are evicted first
+            self.rooms.move_to_end(room_id)
+        return stages
+
+    def observe(self, timing, inject_started, inject_ended):
+        stages = self.histograms(timing.room_id)
+        if timing.client_delay is not None:
+            stages['client'].observe(timing.client_delay)
+        authorized = timing.authorized or timing.received
+        enqueued = timing.enqueued or authorized
+        stages['authorize'].observe(authorized - timing.received)
+        stages['pipeline'].observe(enqueued - authorized)
+        stages['injector_queue'].observe(inject_started - enqueued)
+        stages['inject'].observe(inject_ended - inject_started)
+        stages['total'].observe(inject_ended - timing.received)
+
+    def summary(self, room_id=None):
+        # The injector thread may evict rooms meanwhile, so look each one up once and skip the missing
+        rooms = [room_id] if room_id is not None else list(self.rooms)
+        summary = {}
+        for room in rooms:
+            stages = self.rooms.get(room)
+            if stages is not None:
+                summary[room] = {stage: histogram.summary() for stage, histogram in stages.items()}
+        return summary
+
+    def reset(self):
+        self.rooms = OrderedDict()
+
+
+_tracker = None
+
+
+def get_input_latency_tracker():
+    """
+    Return the process-wide tracker, or None when instrumentation is disabled
+    """
+    global _tracker
+    if not getattr(settings, 'REMOTE_INPUT_LATENCY', False):
+        return None
+    if _tracker is None:
+        _tracker = InputLatencyTracker()
+    return _tracker
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+from collections import deque
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def is_pointer_move(data):
+    """
+    Return True for events that only reposition the pointer and may be coalesced
+    """
+    return data.get("type") == "mouse" and data.get("action") == "move"
+
+
+def is_batch(data):
+    return data.get("type") == "batch"
+
+
+def compress_batch(events):
+    """
+    Drop timing from a batch of (offset, event) pairs and collapse runs of
+    consecutive pointer moves to their last position. Returns the remaining
+    events and how many moves were coalesced.
+    """
+    compressed = []
+    coalesced = 0
+    for _, data in events:
+        if compressed and is_pointer_move(data) and is_pointer_move(compressed[-1][1]):
+            compressed[-1] = (0, data)
+            coalesced += 1
+        else:
+            compressed.append((0, data))
+    return compressed, coalesced
+
+
+class InputPipeline:
+    """
+    Per-connection queue between RoomConsumer.receive and input injection.
+
+    Pointer moves are coalesced latest-wins into a single pending slot and
+    drained at most `move_rate` times per second. Button and key events are
+    never dropped or reordered; a pending move is flushed ahead of them so a
+    click still lands where the pointer was when it was pressed.
+    """
+
+    def __init__(self, handler, move_rate=None):
+        self.handler = handler
+        self.move_interval = 1.0 / move_rate if move_rate else 0.0
+        self.events = deque()
+        self.pending_move = None
+        self.coalesced = 0
+        self.processed = 0
+        self._wakeup = asyncio.Event()
+        self._timer = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """
+        Cancel the drain task; anything still queued is discarded
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def submit(self, data):
+        if is_pointer_move(data):
+            if self.pending_move is not None:
+                self.coalesced += 1
+            self.pending_move = data
+        else:
+            if self.pending_move is not None:
+                self.events.append(self.pending_move)
+                self.pending_move = None
+            self.events.append(data)
+        self._wakeup.set()
+
+    def submit_batch(self, events, preserve_timing=False):
+        """
+        Queue an ordered batch of (offset_seconds, event) pairs to be injected
+        in one go. Without preserve_timing the batch is compressed first, and a
+        batch that compresses to a single event is submitted on its own.
+        """
+        if not events:
+            return
+        if not preserve_timing:
+            events, coalesced = compress_batch(events)
+            self.coalesced += coalesced
+            if len(events) == 1:
+                self.submit(events[0][1])
+                return
+
+        if self.pending_move is not None:
+            self.events.append(self.pending_move)
+            self.pending_move = None
+        self.events.append({
+            "type": "batch",
+            "events": events,
+            "preserve_timing": preserve_timing,
+        })
+        self._wakeup.set()
+
+    def stats(self):
+        return {
+            "processed": self.processed,
+            "coalesced": self.coalesced,
+            "queued": len(self.events) + (self.pending_move is not None),
+        }
+
+    async def _dispatch(self, data):
+        try:
+            await self.handler(data)
+        except Exception as e:
+            metrics.errors.inc(where='input_pipeline')
+            logger.error(f"Error injecting input event: {str(e)}")
+        self.processed += 1
+
+    def _wake(self):
+        self._timer = None
+        self._wakeup.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_move_at = 0.0
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            while self.events:
+                await self._dispatch(self.events.popleft())
+
+            if self.pending_move is None:
+                continue
+
+            delay = next_move_at - loop.time()
+            if delay > 0:
+                # Wait for the next move slot; button/key events still wake us early
+                if self._timer is None:
+                    self._timer = loop.call_later(delay, self._wake)
+                continue
+
+            move, self.pending_move = self.pending_move, None
+            await self._dispatch(move)
+            next_move_at = loop.time() + self.move_interval
@@ -0,0 +1,56 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import remote.asgi
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    'seconds': elapsed,
+    'gui_modules': sorted(m for m in ('pyautogui', 'keyboard', 'Xlib', 'pymsgbox') if m in sys.modules),
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure how long a fresh interpreter takes to import remote.asgi.application '
+        'and whether any GUI automation module gets imported on the way'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--headless', action='store_true', help='Unset DISPLAY in the measured process')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        if options['headless']:
+            env.pop('DISPLAY', None)
+
+        runs = []
+        for _ in range(options['repeat']):
+            result = subprocess.run(
+                [sys.executable, '-c', STARTUP_SCRIPT],
+                capture_output=True, text=True, env=env, cwd=settings.BASE_DIR
+            )
+            if result.returncode != 0:
+                raise CommandError(f"Importing remote.asgi failed:\n{result.stderr}")
+            runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+        seconds = [run['seconds'] for run in runs]
+        self.stdout.write(
+            f"remote.asgi import over {len(runs)} runs: median {statistics.median(seconds) * 1e3:.1f} ms, "
+            f"min {min(seconds) * 1e3:.1f} ms, max {max(seconds) * 1e3:.1f} ms"
+        )
+        gui_modules = runs[-1]['gui_modules']
+        if gui_modules:
+            self.stdout.write(self.style.WARNING(f"GUI modules imported at startup: {', '.join(gui_modules)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("No GUI modules imported at startup"))
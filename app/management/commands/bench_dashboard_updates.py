@@ -0,0 +1,106 @@
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from app.models import Room
+from app.notifications import notification_group, publish_dashboard_event
+from app.testing import IN_MEMORY_CHANNEL_LAYERS
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the database load of dashboards polling user_dashboard with '
+        'dashboards receiving pushed deltas. Runs in a rolled-back transaction '
+        'against an in-memory channel layer.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500, help='Dashboards open at the same time')
+        parser.add_argument('--interval', type=float, default=5.0, help='Polling interval in seconds')
+        parser.add_argument('--minutes', type=float, default=10.0, help='Length of the modelled window')
+        parser.add_argument('--events', type=int, default=3, help='Invitations and room changes per user in the window')
+        parser.add_argument('--pending', type=int, default=5, help='Pending invitations on the sampled dashboard')
+        parser.add_argument('--samples', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, ALLOWED_HOSTS=['testserver']):
+            try:
+                with transaction.atomic():
+                    render, push = self.measure(options['pending'], options['samples'])
+                    raise Rollback
+            except Rollback:
+                pass
+
+        render_queries, render_seconds = render
+        push_queries, push_seconds = push
+        users = options['users']
+        polls = users * options['minutes'] * 60 / options['interval']
+        pushes = users * options['events']
+
+        self.stdout.write(
+            f"user_dashboard render: {render_queries} queries, {render_seconds * 1e3:.2f} ms"
+        )
+        self.stdout.write(
+            f"pushed delta:          {push_queries} queries, {push_seconds * 1e6:.1f} us"
+        )
+        self.stdout.write(
+            f"{users} dashboards over {options['minutes']:g} min, "
+            f"polling every {options['interval']:g}s vs {options['events']} events each:"
+        )
+        # Both sides pay the initial page load
+        polling_queries = (polls + users) * render_queries
+        push_total = users * render_queries + pushes * push_queries
+        self.stdout.write(f"{'polling':>8}: {polling_queries:12,.0f} queries, {(polls + users) * render_seconds:8.1f} s busy")
+        self.stdout.write(f"{'push':>8}: {push_total:12,.0f} queries, {users * render_seconds + pushes * push_seconds:8.1f} s busy")
+        if polling_queries:
+            self.stdout.write(self.style.SUCCESS(
+                f"Dashboard queries removed: {1 - push_total / polling_queries:.1%}"
+            ))
+
+    def measure(self, pending, samples):
+        User = get_user_model()
+        user = User.objects.create_user('bench_dashboard_user')
+        for i in range(pending):
+            creator = User.objects.create_user(f'bench_dashboard_creator{i}')
+            Room.objects.create(room_id=f'bench_dashboard_{i}', creator=creator, receiver=user)
+
+        client = Client()
+        client.force_login(user)
+        url = reverse('user_dashboard')
+        client.get(url)
+
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            for _ in range(samples):
+                client.get(url)
+            render_seconds = (time.perf_counter() - started) / samples
+        render_queries = len(context) / samples
+
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(notification_group(user.id), channel)
+
+        async def push_and_receive():
+            payload = {'event': 'room_state', 'room_id': 'bench_dashboard_0', 'is_active': True, 'is_accepted': True}
+            for _ in range(samples):
+                await publish_dashboard_event(channel_layer, [user.id], payload)
+                await channel_layer.receive(channel)
+
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            async_to_sync(push_and_receive)()
+            push_seconds = (time.perf_counter() - started) / samples
+        push_queries = len(context) / samples
+
+        return (render_queries, render_seconds), (push_queries, push_seconds)
@@ -0,0 +1,136 @@
+import asyncio
+import statistics
+import time
+from unittest import mock
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from app import consumers, input_backends
+from app.injection import InputInjector
+from app.input_backends import DirectBackend, PyAutoGUIBackend, RecordingBackend
+from app.routing import websocket_urlpatterns
+from app.testing import IN_MEMORY_CHANNEL_LAYERS, cached_room
+
+BACKENDS = {
+    'recording': RecordingBackend,
+    'pyautogui': PyAutoGUIBackend,
+    'direct': DirectBackend,
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive RoomConsumer over an in-memory channel layer with synthetic input '
+        'and report injected events per second and injection latency. The '
+        'pyautogui and direct backends really move the pointer and type.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', choices=sorted(BACKENDS), default='recording')
+        parser.add_argument('--cost', type=float, default=0.0,
+                            help='Simulated microseconds per event for the recording backend')
+        parser.add_argument('--rooms', type=int, default=10, help='Concurrent controlling connections')
+        parser.add_argument('--events', type=int, default=1000, help='Key events sent per connection')
+        parser.add_argument('--rate', type=float, default=200.0,
+                            help='Events per second per connection; 0 sends as fast as possible')
+        parser.add_argument('--timeout', type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        if options['backend'] == 'recording':
+            backend = RecordingBackend(cost=options['cost'] / 1e6)
+        else:
+            try:
+                backend = BACKENDS[options['backend']]()
+            except Exception as e:
+                raise CommandError(f"Cannot create the {options['backend']} backend: {str(e)}")
+
+        injected = {}
+
+        def inject(data):
+            backend.inject(data)
+            injected[data['seq']] = time.monotonic()
+
+        injector = InputInjector(
+            inject,
+            maxsize=getattr(settings, 'REMOTE_INPUT_QUEUE_SIZE', 256),
+            max_move_age=getattr(settings, 'REMOTE_INPUT_MAX_MOVE_AGE', 0.25),
+            max_batch_delay=getattr(settings, 'REMOTE_INPUT_BATCH_MAX_DELAY', 0.1)
+        )
+        # Measures injection, not admission: the flood would otherwise be rate limited
+        # Rooms exist only in the local membership cache, so keep them for the whole run
+        with override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, REMOTE_RATE_LIMITS=None,
+                               REMOTE_ROOM_CACHE_LOCAL_TTL=3600), \
+                mock.patch.object(input_backends, '_input_available', True), \
+                mock.patch.object(consumers, '_injector', injector):
+            sent, elapsed = asyncio.run(self.run_load(options, injected))
+
+        latencies = [injected[seq] - sent[seq] for seq in sent if seq in injected]
+        self.stdout.write(
+            f"{options['backend']} backend, {options['rooms']} connections x {options['events']} key events"
+            f" at {options['rate'] or 'max'} events/s each"
+        )
+        self.stdout.write(f"injected {len(latencies)}/{len(sent)} events in {elapsed:.2f} s")
+        if not latencies:
+            return
+        self.stdout.write(f"throughput: {len(latencies) / elapsed:,.0f} events/s")
+        self.stdout.write(
+            f"latency ms: p50 {statistics.median(latencies) * 1e3:.2f}"
+            f"  p95 {percentile(latencies, 0.95) * 1e3:.2f}"
+            f"  p99 {percentile(latencies, 0.99) * 1e3:.2f}"
+            f"  max {max(latencies) * 1e3:.2f}"
+        )
+        self.stdout.write(f"injector: {injector.stats()}")
+
+    async def connect(self, application, index):
+        """
+        Open a controlling connection to a room that exists only in the membership cache
+        """
+        room, creator, _ = await cached_room(f'bench_input_{index}', index)
+
+        communicator = WebsocketCommunicator(application, f'/ws/room/{room.room_id}/')
+        communicator.scope['user'] = creator
+        connected, _ = await communicator.connect()
+        if not connected:
+            raise CommandError(f"RoomConsumer refused connection {index}")
+        await communicator.receive_from()  # presence snapshot
+        return communicator
+
+    async def run_load(self, options, injected):
+        application = URLRouter(websocket_urlpatterns)
+        communicators = [await self.connect(application, index) for index in range(options['rooms'])]
+        sent = {}
+
+        async def stream(index, communicator):
+            interval = 1 / options['rate'] if options['rate'] else 0
+            next_at = time.monotonic()
+            for n in range(options['events']):
+                if interval:
+                    next_at += interval
+                    await asyncio.sleep(max(0, next_at - time.monotonic()))
+                seq = index * options['events'] + n
+                sent[seq] = time.monotonic()
+                await communicator.send_json_to({'type': 'screen_data', 'data': {
+                    'type': 'keyboard', 'action': 'down' if n % 2 == 0 else 'up', 'key': 'a', 'seq': seq
+                }})
+                if not interval and n % 50 == 0:
+                    await asyncio.sleep(0)
+
+        started = time.monotonic()
+        await asyncio.gather(*(stream(index, c) for index, c in enumerate(communicators)))
+        deadline = started + options['timeout']
+        while len(injected) < len(sent) and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        elapsed = (max(injected.values()) if injected else time.monotonic()) - started
+
+        for communicator in communicators:
+            await communicator.disconnect()
+        return sent, elapsed
@@ -0,0 +1,93 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from app.codec import available_codecs, get_codec
+
+
+def sample_sdp(media_sections=2, candidates=8):
+    """
+    A browser-like offer SDP: audio and video sections with codecs and host candidates
+    """
+    lines = [
+        'v=0', 'o=- 4611731400430051336 2 IN IP4 127.0.0.1', 's=-', 't=0 0',
+        'a=group:BUNDLE ' + ' '.join(str(n) for n in range(media_sections)),
+        'a=extmap-allow-mixed', 'a=msid-semantic: WMS stream',
+    ]
+    for mid in range(media_sections):
+        lines += [
+            f'm=video 9 UDP/TLS/RTP/SAVPF {" ".join(str(96 + n) for n in range(16))}',
+            'c=IN IP4 0.0.0.0', 'a=rtcp:9 IN IP4 0.0.0.0',
+            'a=ice-ufrag:Xk4p', 'a=ice-pwd:Jx1v8Sx0gXbD3F0ZpJ7mYQb2', 'a=ice-options:trickle',
+            'a=fingerprint:sha-256 ' + ':'.join(f'{n:02X}' for n in range(32)),
+            'a=setup:actpass', f'a=mid:{mid}', 'a=sendrecv', 'a=rtcp-mux', 'a=rtcp-rsize',
+        ]
+        for n in range(16):
+            lines += [
+                f'a=rtpmap:{96 + n} VP8/90000', f'a=rtcp-fb:{96 + n} goog-remb',
+                f'a=rtcp-fb:{96 + n} transport-cc', f'a=rtcp-fb:{96 + n} nack pli',
+            ]
+        lines += [
+            f'a=candidate:{n} 1 udp 2122260223 192.168.1.{n + 2} {50000 + n} typ host generation 0'
+            for n in range(candidates)
+        ]
+    return '\r\n'.join(lines) + '\r\n'
+
+
+def payloads(batch_size):
+    move = {'type': 'mouse', 'action': 'move', 'x': 1280, 'y': 720}
+    return {
+        'input event': {'type': 'screen_data', 'data': move, 'ts': 1760000000000},
+        f'input batch ({batch_size})': {
+            'type': 'screen_data_batch',
+            'events': [{'t': n * 4, 'data': move} for n in range(batch_size)],
+            'ts': 1760000000000,
+        },
+        'SDP offer': {
+            'type': 'webrtc.offer',
+            'offer': {'type': 'offer', 'sdp': sample_sdp()},
+            'roomId': 'room_3f9a1c2b7d',
+            'sender_id': '4823019576',
+        },
+        'ICE candidate': {
+            'type': 'ice_candidate',
+            'candidate': {
+                'candidate': 'candidate:842163049 1 udp 1677729535 203.0.113.7 61234 typ srflx '
+                             'raddr 192.168.1.20 rport 61234 generation 0 ufrag Xk4p network-cost 999',
+                'sdpMid': '0', 'sdpMLineIndex': 0, 'usernameFragment': 'Xk4p',
+            },
+            'roomId': 'room_3f9a1c2b7d',
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare encode and decode times of the installed JSON codecs on the '
+        'payload shapes the room consumer handles: input events, input '
+        'batches, SDP offers and ICE candidates'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=20000, help='Calls per measurement')
+        parser.add_argument('--batch', type=int, default=32, help='Events per input batch')
+
+    def handle(self, *args, **options):
+        number = options['number']
+        codecs = [get_codec(name) for name in available_codecs()]
+        self.stdout.write(f"codecs: {', '.join(c.name for c in codecs)} (default: {codecs[0].name})")
+
+        for shape, payload in payloads(options['batch']).items():
+            size = len(codecs[-1].dumpb(payload))
+            self.stdout.write(f"\n{shape} ({size:,} bytes)")
+            baseline = None
+            for json_codec in codecs[::-1]:
+                text = json_codec.dumps(payload)
+                encode = min(timeit.repeat(lambda: json_codec.dumps(payload), number=number, repeat=3)) / number
+                decode = min(timeit.repeat(lambda: json_codec.loads(text), number=number, repeat=3)) / number
+                if baseline is None:
+                    baseline = (encode, decode)
+                self.stdout.write(
+                    f"  {json_codec.name:>8}: encode {encode * 1e6:8.2f} us ({baseline[0] / encode:4.1f}x)"
+                    f"  decode {decode * 1e6:8.2f} us ({baseline[1] / decode:4.1f}x)"
+                )
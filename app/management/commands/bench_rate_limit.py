@@ -0,0 +1,42 @@
+import json
+import timeit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.client_messages import parse_client_message
+from app.rate_limit import ConnectionRateLimiter, event_class, input_costs
+
+POINTER_MOVE = {'type': 'mouse', 'action': 'move', 'x': 640, 'y': 360}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the per-message cost of the RoomConsumer rate limiter: one token '
+        'for a single event, a full input batch, and a signaling message, next to '
+        'the parse and validation every text message already pays'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=200000, help='Calls per measurement')
+        parser.add_argument('--batch', type=int, default=32, help='Events per input batch')
+
+    def handle(self, *args, **options):
+        number = options['number']
+        # Budgets large enough that every call takes the common, allowed path
+        limits = {name: (1e12, 1e12) for name in getattr(settings, 'REMOTE_RATE_LIMITS', None) or ('pointer', 'key', 'signaling')}
+        limiter = ConnectionRateLimiter(limits, close_after=None)
+
+        message = {'type': 'screen_data', 'data': POINTER_MOVE, 'ts': 1700000000000}
+        text = json.dumps(message)
+        batch = [(n, dict(POINTER_MOVE)) for n in range(options['batch'])]
+
+        cases = [
+            ('parse + validate screen_data (baseline)', lambda: parse_client_message(text)),
+            ('limit single event', lambda: limiter.check_costs({event_class(POINTER_MOVE): 1})),
+            ('limit signaling message', lambda: limiter.check('signaling')),
+            (f"limit {options['batch']}-event batch", lambda: limiter.check_costs(input_costs(batch))),
+        ]
+        for name, call in cases:
+            seconds = min(timeit.repeat(call, number=number, repeat=3)) / number
+            self.stdout.write(f"{name:>42}: {seconds * 1e9:8.0f} ns/message")
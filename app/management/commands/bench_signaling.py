@@ -0,0 +1,79 @@
+import json
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from app.signaling import encode_envelope, envelope_frame
+
+
+def make_sdp(size):
+    """
+    Build an SDP offer of roughly `size` bytes shaped like a browser screen-share offer
+    """
+    lines = [
+        'v=0',
+        'o=- 4611731400430051336 2 IN IP4 127.0.0.1',
+        's=-',
+        't=0 0',
+        'a=group:BUNDLE 0',
+        'a=msid-semantic: WMS stream',
+        'm=video 9 UDP/TLS/RTP/SAVPF 96 97 98 99 100 101 102',
+        'c=IN IP4 0.0.0.0',
+        'a=ice-ufrag:EsAw',
+        'a=ice-pwd:bP+XJMM09aR8AiX1jdukzR6Y',
+        'a=fingerprint:sha-256 D2:FA:0E:C3:22:59:5E:14:95:69:92:3D:13:B4:84:24:2C:C2:A2:C0:3E:FD:34:8E:5E:EA:6F:AF:52:CE:E6:0F',
+        'a=setup:actpass',
+        'a=mid:0',
+        'a=sendrecv',
+        'a=rtcp-mux',
+    ]
+    payload_type = 96
+    while sum(len(line) + 2 for line in lines) < size:
+        lines.append(f'a=rtpmap:{payload_type} VP8/90000')
+        lines.append(f'a=rtcp-fb:{payload_type} goog-remb')
+        lines.append(f'a=rtcp-fb:{payload_type} transport-cc')
+        lines.append(f'a=fmtp:{payload_type} level-asymmetry-allowed=1;packetization-mode=1;profile-level-id=42e01f')
+        payload_type += 1
+    return '\r\n'.join(lines) + '\r\n'
+
+
+class Command(BaseCommand):
+    help = 'Compare per-receiver JSON encoding of signaling events with pre-encoded envelopes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sdp-size', type=int, default=6000, help='Approximate SDP size in bytes')
+        parser.add_argument('--receivers', type=int, default=2, help='Consumers receiving each event')
+        parser.add_argument('--iterations', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        receivers = options['receivers']
+        iterations = options['iterations']
+        payload = {
+            'type': 'webrtc.offer',
+            'offer': {'type': 'offer', 'sdp': make_sdp(options['sdp_size'])},
+            'roomId': 'room_0123456789',
+            'sender_id': '1234567890',
+        }
+
+        def per_receiver():
+            event = dict(payload)
+            for _ in range(receivers):
+                json.dumps(event)
+
+        def pre_encoded():
+            event = encode_envelope(payload)
+            for _ in range(receivers):
+                envelope_frame(event)
+
+        frame_size = len(encode_envelope(payload)['frame'])
+        self.stdout.write(
+            f"SDP offer: {frame_size} bytes encoded, {receivers} receivers, {iterations} events"
+        )
+        results = {}
+        for name, func in (('per-receiver json.dumps', per_receiver), ('pre-encoded envelope', pre_encoded)):
+            seconds = min(timeit.repeat(func, number=iterations, repeat=3))
+            results[name] = seconds
+            self.stdout.write(f"{name:>24}: {seconds / iterations * 1e6:8.2f} us/event")
+
+        saving = 1 - results['pre-encoded envelope'] / results['per-receiver json.dumps']
+        self.stdout.write(self.style.SUCCESS(f"Encoding time saved: {saving:.0%}"))
@@ -0,0 +1,219 @@
+import asyncio
+import json
+import statistics
+import time
+from unittest import mock
+
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from app import consumers, input_backends
+from app.injection import InputInjector
+from app.input_backends import RecordingBackend
+from app.testing import IN_MEMORY_CHANNEL_LAYERS, cached_room
+
+
+def summarize(values):
+    """
+    Percentile summary of latencies in seconds, reported in milliseconds
+    """
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1e3, 3)
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1e3, 3),
+        'p50_ms': at(0.50),
+        'p95_ms': at(0.95),
+        'p99_ms': at(0.99),
+        'max_ms': round(ordered[-1] * 1e3, 3),
+    }
+
+
+async def receive_type(communicator, message_type, timeout):
+    """
+    Return the next JSON message of `message_type`, skipping any others
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        message = await communicator.receive_json_from(timeout=max(0.001, deadline - time.monotonic()))
+        if message.get('type') == message_type:
+            return message
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test RoomConsumer in-process: drive remote.asgi.application with '
+        'WebsocketCommunicator over an in-memory channel layer, run offer/answer/ICE '
+        'exchanges and sustained input in N rooms, and report latencies and throughput. '
+        'Users are unsaved and rooms live only in a local-memory membership cache, '
+        'so no database is touched; input goes to a recording backend.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=100)
+        parser.add_argument('--candidates', type=int, default=4, help='ICE candidates per side')
+        parser.add_argument('--input-rate', type=float, default=60.0, help='Input events per second per room')
+        parser.add_argument('--input-seconds', type=float, default=5.0)
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per-message receive timeout')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON only')
+        parser.add_argument('--output', help='Also write the JSON results to this file')
+
+    def handle(self, *args, **options):
+        from remote.asgi import application
+
+        backend = RecordingBackend()
+        injected = {}
+
+        def inject(data):
+            backend.inject(data)
+            injected[data['seq']] = time.monotonic()
+
+        self.injected = injected
+        injector = InputInjector(inject, maxsize=4096)
+        # Room membership and signaling state for every room must fit in the cache
+        caches = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': options['rooms'] * 10},
+        }}
+        with override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, CACHES=caches, REMOTE_ROOM_CACHE='default',
+                               REMOTE_ROOM_CACHE_LOCAL_TTL=3600), \
+                mock.patch.object(input_backends, '_input_available', True), \
+                mock.patch.object(consumers, '_injector', injector):
+            results = asyncio.run(self.run(application, options))
+        results['injector'] = injector.stats()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{results['rooms']} rooms, {results['errors']} failed")
+        for name, summary in results['latency'].items():
+            if summary['count']:
+                self.stdout.write(
+                    f"{name:>14}: n={summary['count']:<7} p50 {summary['p50_ms']:8.2f} ms"
+                    f"  p95 {summary['p95_ms']:8.2f} ms  p99 {summary['p99_ms']:8.2f} ms"
+                )
+        throughput = results['throughput']
+        self.stdout.write(
+            f"input: {throughput['input_injected']}/{throughput['input_sent']} injected, "
+            f"{throughput['input_events_per_second']:,.0f} events/s; "
+            f"signaling: {throughput['signaling_messages_per_second']:,.0f} messages/s"
+        )
+
+    async def open_room(self, application, index, latency, timeout):
+        room, creator, receiver = await cached_room(f'load_{index}', index)
+
+        peers = []
+        for user in (creator, receiver):
+            communicator = WebsocketCommunicator(application, f'/ws/room/{room.room_id}/')
+            communicator.scope['user'] = user
+            started = time.monotonic()
+            connected, _ = await communicator.connect(timeout=timeout)
+            if not connected:
+                raise CommandError(f"Connection to {room.room_id} refused")
+            await receive_type(communicator, 'presence', timeout)
+            latency['connect'].append(time.monotonic() - started)
+            peers.append(communicator)
+        await receive_type(peers[0], 'user_connected', timeout)
+        return peers
+
+    async def negotiate(self, creator, receiver, options, latency):
+        """
+        Offer, answer and a trickle of ICE candidates in both directions
+        """
+        timeout = options['timeout']
+        await creator.send_json_to({'type': 'webrtc.offer', 'offer': {'type': 'offer', 'sdp': 'v=0'}, 't': time.monotonic()})
+        message = await receive_type(receiver, 'webrtc.offer', timeout)
+        latency['offer'].append(time.monotonic() - message['t'])
+
+        await receiver.send_json_to({'type': 'webrtc.answer', 'answer': {'type': 'answer', 'sdp': 'v=0'}, 't': time.monotonic()})
+        message = await receive_type(creator, 'webrtc.answer', timeout)
+        latency['answer'].append(time.monotonic() - message['t'])
+
+        for sender, target in ((creator, receiver), (receiver, creator)):
+            started = time.monotonic()
+            for n in range(options['candidates']):
+                await sender.send_json_to({
+                    'type': 'ice_candidate',
+                    'candidate': {'candidate': f'candidate:{n} 1 udp 2122260223 10.0.0.{n} 5000{n} typ host', 'sdpMid': '0'}
+                })
+            await sender.send_json_to({'type': 'ice_candidate', 'candidate': None})
+            received = 0
+            while received < options['candidates']:
+                message = await receive_type(target, 'ice_candidates', timeout)
+                received += len(message['candidates'])
+            latency['ice'].append(time.monotonic() - started)
+        return 2 + 2 * (options['candidates'] + 1)
+
+    async def stream_input(self, index, creator, options, sent):
+        interval = 1 / options['input_rate']
+        count = int(options['input_rate'] * options['input_seconds'])
+        next_at = time.monotonic()
+        for n in range(count):
+            next_at += interval
+            await asyncio.sleep(max(0, next_at - time.monotonic()))
+            seq = index * count + n
+            sent[seq] = time.monotonic()
+            await creator.send_json_to({'type': 'screen_data', 'data': {
+                'type': 'keyboard', 'action': 'down' if n % 2 == 0 else 'up', 'key': 'a', 'seq': seq
+            }})
+
+    async def run(self, application, options):
+        latency = {'connect': [], 'offer': [], 'answer': [], 'ice': [], 'input': []}
+        errors = 0
+
+        async def open_room(index):
+            try:
+                return await self.open_room(application, index, latency, options['timeout'])
+            except Exception as e:
+                self.stderr.write(f"Room {index} failed to open: {str(e)}")
+                return None
+
+        rooms = await asyncio.gather(*(open_room(index) for index in range(options['rooms'])))
+        errors += rooms.count(None)
+        live = [(index, peers) for index, peers in enumerate(rooms) if peers]
+
+        started = time.monotonic()
+        outcomes = await asyncio.gather(
+            *(self.negotiate(creator, receiver, options, latency) for _, (creator, receiver) in live),
+            return_exceptions=True
+        )
+        signaling_seconds = time.monotonic() - started
+        signaling_messages = sum(outcome for outcome in outcomes if isinstance(outcome, int))
+        errors += sum(1 for outcome in outcomes if isinstance(outcome, Exception))
+
+        sent = {}
+        started = time.monotonic()
+        await asyncio.gather(*(self.stream_input(index, creator, options, sent) for index, (creator, _) in live))
+        deadline = time.monotonic() + options['timeout']
+        while len(self.injected) < len(sent) and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        input_seconds = (max(self.injected.values()) if self.injected else time.monotonic()) - started
+        latency['input'] = [self.injected[seq] - sent[seq] for seq in sent if seq in self.injected]
+
+        for _, peers in live:
+            for communicator in peers:
+                await communicator.disconnect()
+
+        return {
+            'rooms': options['rooms'],
+            'errors': errors,
+            'config': {key: options[key] for key in ('candidates', 'input_rate', 'input_seconds')},
+            'latency': {name: summarize(values) for name, values in latency.items()},
+            'throughput': {
+                'signaling_messages': signaling_messages,
+                'signaling_messages_per_second': round(signaling_messages / signaling_seconds, 1) if signaling_seconds else 0,
+                'input_sent': len(sent),
+                'input_injected': len(latency['input']),
+                'input_events_per_second': round(len(latency['input']) / input_seconds, 1) if input_seconds > 0 else 0,
+            },
+        }
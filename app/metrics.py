@@ -0,0 +1,327 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms keep one shard per thread: a thread only
+ever writes its own shard, so recording a sample takes no lock, and reading
+sums the shards. Shards of exited threads are folded into a retired total. Gauges are sums of increments, which is what the gauges here
+(open connections) need.
+
+Each worker process publishes a snapshot of its metrics to the Django cache
+named by REMOTE_METRICS_CACHE every REMOTE_METRICS_PUBLISH_INTERVAL seconds.
+The /metrics view merges the snapshots of all live workers with its own live
+values, so any worker can answer a scrape for the whole deployment when the
+cache is shared (Redis); with a local-memory cache each worker reports itself.
+"""
+import bisect
+import functools
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+WORKERS_KEY = 'metrics:workers'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        # (owning thread, shard) pairs; shards of exited threads are folded into _retired
+        self._shards = []
+        self._retired = {}
+        self._shards_lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            # Only taken once per thread, when its shard is created
+            with self._shards_lock:
+                self._retire_shards()
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def _retire_shards(self):
+        """
+        Fold the shards of threads that have exited into _retired, so thread
+        churn (executor and request threads) does not grow the shard list.
+        Called with _shards_lock held; a dead thread can no longer write its shard.
+        """
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                for key, value in shard.items():
+                    self._retired[key] = self.merge_values(self._retired.get(key), value)
+        self._shards = live
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """
+        Return {label values: value} summed over all thread shards
+        """
+        with self._shards_lock:
+            self._retire_shards()
+            merged = {key: self.merge_values(None, value) for key, value in self._retired.items()}
+            shards = [shard for _, shard in self._shards]
+        for shard in shards:
+            for key, value in list(shard.items()):
+                merged[key] = self.merge_values(merged.get(key), value)
+        return merged
+
+    def merge_values(self, a, b):
+        return b if a is None else a + b
+
+    def describe(self):
+        return {'kind': self.kind, 'help': self.help, 'labelnames': self.labelnames}
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        entry = shard.get(key)
+        if entry is None:
+            entry = shard[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def merge_values(self, a, b):
+        return merge_histogram(a, b)
+
+    def describe(self):
+        return {**super().describe(), 'buckets': self.buckets}
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+def merge_histogram(a, b):
+    """
+    Sum two [bucket counts, sum, count] histogram values; `a` may be None
+    """
+    if a is None:
+        return [list(b[0]), b[1], b[2]]
+    return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self):
+        return {
+            name: {**metric.describe(), 'samples': metric.samples()}
+            for name, metric in self.metrics.items()
+        }
+
+
+def merge_snapshots(snapshots):
+    """
+    Sum counters, gauges and histograms of several worker snapshots
+    """
+    merged = {}
+    for snapshot in snapshots:
+        for name, family in snapshot.items():
+            target = merged.setdefault(name, {**family, 'samples': {}})
+            for key, value in family['samples'].items():
+                current = target['samples'].get(key)
+                if family['kind'] == 'histogram':
+                    target['samples'][key] = merge_histogram(current, value)
+                else:
+                    target['samples'][key] = value if current is None else current + value
+    return merged
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs) + '}'
+
+
+def render(snapshot):
+    """
+    Render a snapshot in the Prometheus text exposition format
+    """
+    lines = []
+    for name, family in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        labelnames = family['labelnames']
+        for key, value in sorted(family['samples'].items()):
+            if family['kind'] != 'histogram':
+                lines.append(f"{name}{format_labels(labelnames, key)} {value}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(list(family['buckets']) + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{format_labels(labelnames, key, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labelnames, key)} {total}")
+            lines.append(f"{name}_count{format_labels(labelnames, key)} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+websocket_connections = registry.register(Gauge(
+    'remote_websocket_connections', 'Open WebSocket connections', ['consumer']
+))
+consumer_messages = registry.register(Counter(
+    'remote_consumer_messages_total', 'Messages handled by RoomConsumer.receive', ['type']
+))
+channel_layer_seconds = registry.register(Histogram(
+    'remote_channel_layer_send_seconds', 'Latency of channel layer send and group_send calls', ['operation']
+))
+view_seconds = registry.register(Histogram(
+    'remote_view_seconds', 'Latency of room views', ['view']
+))
+rejected_messages = registry.register(Counter(
+    'remote_rejected_messages_total', 'Client messages rejected by validation instead of handled',
+    ['type', 'reason']
+))
+throttled_messages = registry.register(Counter(
+    'remote_throttled_messages_total', 'Client messages dropped by per-connection rate limits',
+    ['message_class']
+))
+errors = registry.register(Counter(
+    'remote_errors_total', 'Exceptions caught and logged instead of raised', ['where']
+))
+
+
+def timed_view(name):
+    """
+    Record the latency of a view in remote_view_seconds
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            get_publisher()
+            with view_seconds.time(view=name):
+                return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class SnapshotPublisher:
+    """
+    Publishes this worker's snapshot to the metrics cache from a daemon thread
+    """
+
+    def __init__(self, cache_alias='default', interval=10):
+        self.cache_alias = cache_alias
+        self.interval = interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def key(self, worker_id):
+        return f"metrics:worker:{worker_id}"
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='metrics-publisher', daemon=True)
+                self._thread.start()
+
+    def publish(self):
+        ttl = self.interval * 3
+        self.cache.set(self.key(self.worker_id), registry.snapshot(), ttl)
+        # Racy read-modify-write, but every worker re-adds itself on each publish
+        workers = set(self.cache.get(WORKERS_KEY) or ())
+        if self.worker_id not in workers:
+            workers.add(self.worker_id)
+            self.cache.set(WORKERS_KEY, workers, None)
+
+    def collect(self):
+        """
+        This worker's live snapshot merged with the published snapshots of all other workers
+        """
+        snapshots = [registry.snapshot()]
+        workers = set(self.cache.get(WORKERS_KEY) or ()) - {self.worker_id}
+        if workers:
+            published = self.cache.get_many([self.key(worker) for worker in workers])
+            snapshots.extend(published.values())
+            expired = {worker for worker in workers if self.key(worker) not in published}
+            if expired:
+                self.cache.set(WORKERS_KEY, set(self.cache.get(WORKERS_KEY) or ()) - expired, None)
+        return merge_snapshots(snapshots)
+
+    def _run(self):
+        while True:
+            try:
+                self.publish()
+            except Exception:
+                errors.inc(where='metrics_publish')
+            time.sleep(self.interval)
+
+
+_publisher = None
+
+
+def get_publisher():
+    """
+    Return the process-wide snapshot publisher, starting it on first use
+    """
+    global _publisher
+    if _publisher is None:
+        _publisher = SnapshotPublisher(
+            cache_alias=getattr(settings, 'REMOTE_METRICS_CACHE', 'default'),
+            interval=getattr(settings, 'REMOTE_METRICS_PUBLISH_INTERVAL', 10)
+        )
+        _publisher.start()
+    return _publisher
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_alter_room_room_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['creator', 'is_active', 'is_accepted'], name='room_creator_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['receiver', 'is_active', 'is_accepted'], name='room_receiver_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(condition=models.Q(('is_accepted', False), ('is_active', True)), fields=['receiver', '-created_at'], name='room_pending_receiver_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['creator', 'receiver'], name='room_active_pair_idx'),
+        ),
+    ]
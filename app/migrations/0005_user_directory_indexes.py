@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_user_id_sequence'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('user_type', 'regular_user')), fields=['username'], name='user_directory_username_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('user_type', 'regular_user')), fields=['user_id'], name='user_directory_user_id_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -1,6 +1,14 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import AbstractUser
-import random
+from .user_ids import allocate_user_ids
+
+
+class UserIdSequence(models.Model):
+    """
+    Counter behind user id allocation on backends without native sequences
+    """
+    value = models.BigIntegerField(default=0)
+
 
 class CustomUser(AbstractUser):
     USER_TYPE_CHOICES = (
@@ -10,15 +18,40 @@ class CustomUser(AbstractUser):
     
     user_type = models.CharField(max_length=20, choices=USER_TYPE_CHOICES, default='regular_user')
     user_id = models.CharField(max_length=10, unique=True, null=True, blank=True)
+
+    class Meta(AbstractUser.Meta):
+        swappable = 'AUTH_USER_MODEL'
+        indexes = [
+            # Prefix search in the superuser directory; pattern ops let LIKE 'abc%' use the index
+            models.Index(
+                fields=['username'],
+                opclasses=['varchar_pattern_ops'],
+                condition=models.Q(user_type='regular_user'),
+                name='user_directory_username_idx'
+            ),
+            models.Index(
+                fields=['user_id'],
+                opclasses=['varchar_pattern_ops'],
+                condition=models.Q(user_type='regular_user'),
+                name='user_directory_user_id_idx'
+            ),
+        ]
     
     def save(self, *args, **kwargs):
-        if not self.user_id:
-            while True:
-                user_id = str(random.randint(1000000000, 9999999999))
-                if not CustomUser.objects.filter(user_id=user_id).exists():
-                    self.user_id = user_id
-                    break
-        super().save(*args, **kwargs)
+        if self.user_id:
+            return super().save(*args, **kwargs)
+
+        using = kwargs.get('using') or 'default'
+        while True:
+            self.user_id = allocate_user_ids(1, using)[0]
+            try:
+                # Allocated ids never repeat, but may hit one of the legacy random ids
+                with transaction.atomic(using=using):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if not CustomUser.objects.using(using).filter(user_id=self.user_id).exists():
+                    self.user_id = None
+                    raise
 
         
 class Room(models.Model):
@@ -36,6 +69,23 @@ class Room(models.Model):
                 name='unique_active_room'
             )
         ]
+        indexes = [
+            # Dashboard and RoomConsumer lookups by member and room state
+            models.Index(fields=['creator', 'is_active', 'is_accepted'], name='room_creator_state_idx'),
+            models.Index(fields=['receiver', 'is_active', 'is_accepted'], name='room_receiver_state_idx'),
+            # Pending invitations per receiver, newest first; only live rows are indexed
+            models.Index(
+                fields=['receiver', '-created_at'],
+                condition=models.Q(is_active=True, is_accepted=False),
+                name='room_pending_receiver_idx'
+            ),
+            # create_room's existing-room check for a creator/receiver pair
+            models.Index(
+                fields=['creator', 'receiver'],
+                condition=models.Q(is_active=True),
+                name='room_active_pair_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"Room {self.room_id} ({self.creator.username} -> {self.receiver.username})"
@@ -0,0 +1,52 @@
+"""
+Live dashboard updates.
+
+Every signed-in dashboard keeps a NotificationConsumer open, joined to its
+user's notification group. Views publish small deltas to that group when an
+invitation arrives or a room changes state, so the dashboard can update in
+place instead of being reloaded (and re-running its room queries) to find out.
+
+Deltas are JSON-encoded once per publish and forwarded as-is by the consumer:
+
+    {"event": "invitation", "room_id": ..., "creator": <username>}
+    {"event": "room_state", "room_id": ..., "is_active": ..., "is_accepted": ...}
+"""
+import asyncio
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from . import codec, metrics
+
+logger = logging.getLogger(__name__)
+
+
+def notification_group(user_id):
+    return f"user_{user_id}_notifications"
+
+
+def dashboard_event(payload):
+    return {'type': 'dashboard_event', 'frame': codec.dumps(payload)}
+
+
+async def publish_dashboard_event(channel_layer, user_ids, payload):
+    """
+    Send one delta to the notification groups of `user_ids`
+    """
+    event = dashboard_event(payload)
+    await asyncio.gather(*(
+        channel_layer.group_send(notification_group(user_id), event)
+        for user_id in user_ids
+    ))
+
+
+def notify_users(user_ids, payload):
+    """
+    Publish a dashboard delta from synchronous code; failures are logged, not raised
+    """
+    try:
+        async_to_sync(publish_dashboard_event)(get_channel_layer(), user_ids, payload)
+    except Exception as e:
+        metrics.errors.inc(where='notify_users')
+        logger.error(f"Error notifying users {list(user_ids)} of {payload.get('event')}: {str(e)}")
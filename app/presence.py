@@ -0,0 +1,173 @@
+"""
+Who is currently connected to each room.
+
+Every RoomConsumer (and HTTP signaling poller) registers under its role in the
+room and refreshes the entry with a heartbeat; entries carry an expiry time,
+so a worker that dies without running disconnect() simply drops out once its
+entry goes stale. Stale entries are removed lazily when the room is read,
+never announced to anyone.
+
+There is at most one entry per role, so "is my peer online?" is a single
+lookup. Two implementations share one interface:
+
+    RedisPresenceRegistry   a hash per room on the Redis server behind
+                            channels_redis, shared by all workers
+    MemoryPresenceRegistry  process-local, for InMemoryChannelLayer and tests
+
+Other channel layers (e.g. channels_redis.pubsub) get the process-local
+registry too, with a warning: each worker then only sees its own peers.
+"""
+import logging
+import time
+
+from channels.layers import InMemoryChannelLayer
+from django.conf import settings
+
+from . import codec
+
+logger = logging.getLogger(__name__)
+
+# Remove a role's entry only if it still belongs to the leaving channel
+LEAVE_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+if current and cjson.decode(current)['channel_name'] == ARGV[2] then
+    return redis.call('HDEL', KEYS[1], ARGV[1])
+end
+return 0
+"""
+
+# Remove the given roles' entries only if they are still expired (ARGV[1] is
+# the current time), so a heartbeat landing after the read is kept
+REAP_SCRIPT = """
+local removed = 0
+for i = 2, #ARGV do
+    local current = redis.call('HGET', KEYS[1], ARGV[i])
+    if current and cjson.decode(current)['expires'] <= tonumber(ARGV[1]) then
+        removed = removed + redis.call('HDEL', KEYS[1], ARGV[i])
+    end
+end
+return removed
+"""
+
+
+def make_entry(user_id, channel_name, ttl):
+    return {'user_id': str(user_id), 'channel_name': channel_name, 'expires': time.time() + ttl}
+
+
+def is_live(entry):
+    return entry is not None and entry['expires'] > time.time()
+
+
+def presence_snapshot(room_id, members):
+    """
+    The client-facing view of a room's members, without channel names
+    """
+    return {
+        'type': 'presence',
+        'room_id': room_id,
+        'members': [
+            {'role': role, 'user_id': entry['user_id']}
+            for role, entry in sorted(members.items())
+        ]
+    }
+
+
+class MemoryPresenceRegistry:
+    def __init__(self, ttl=45):
+        self.ttl = ttl
+        self.rooms = {}
+
+    async def join(self, room_id, role, user_id, channel_name):
+        """
+        Register or refresh a channel under its role; also serves as the heartbeat
+        """
+        self.rooms.setdefault(room_id, {})[role] = make_entry(user_id, channel_name, self.ttl)
+
+    async def leave(self, room_id, role, channel_name):
+        members = self.rooms.get(room_id, {})
+        entry = members.get(role)
+        if entry is not None and entry['channel_name'] == channel_name:
+            del members[role]
+        if not members:
+            self.rooms.pop(room_id, None)
+
+    async def get(self, room_id, role):
+        return (await self.members(room_id)).get(role)
+
+    async def members(self, room_id):
+        """
+        Return {role: entry} for the live members of a room, reaping stale ones
+        """
+        members = self.rooms.get(room_id, {})
+        for role in [role for role, entry in members.items() if not is_live(entry)]:
+            del members[role]
+        if not members:
+            self.rooms.pop(room_id, None)
+        return dict(members)
+
+
+class RedisPresenceRegistry:
+    def __init__(self, channel_layer, ttl=45):
+        self.channel_layer = channel_layer
+        self.ttl = ttl
+
+    def key(self, room_id):
+        return f"{self.channel_layer.prefix}:presence:{room_id}"
+
+    def connection(self, room_id):
+        return self.channel_layer.connection(self.channel_layer.consistent_hash(room_id))
+
+    async def join(self, room_id, role, user_id, channel_name):
+        key = self.key(room_id)
+        async with self.connection(room_id).pipeline(transaction=False) as pipe:
+            pipe.hset(key, role, codec.dumps(make_entry(user_id, channel_name, self.ttl)))
+            # The whole room disappears if nobody heartbeats it any more
+            pipe.expire(key, self.ttl * 2)
+            await pipe.execute()
+
+    async def leave(self, room_id, role, channel_name):
+        await self.connection(room_id).eval(LEAVE_SCRIPT, 1, self.key(room_id), role, channel_name)
+
+    async def get(self, room_id, role):
+        value = await self.connection(room_id).hget(self.key(room_id), role)
+        entry = codec.loads(value) if value else None
+        return entry if is_live(entry) else None
+
+    async def members(self, room_id):
+        connection = self.connection(room_id)
+        stored = await connection.hgetall(self.key(room_id))
+        members, stale = {}, []
+        for role, value in stored.items():
+            role = role.decode() if isinstance(role, bytes) else role
+            entry = codec.loads(value)
+            if is_live(entry):
+                members[role] = entry
+            else:
+                stale.append(role)
+        if stale:
+            await connection.eval(REAP_SCRIPT, 1, self.key(room_id), time.time(), *stale)
+        return members
+
+
+_memory_registry = None
+_warned_layers = set()
+
+
+def get_presence_registry(channel_layer):
+    """
+    Return the presence registry that matches the channel layer in use
+    """
+    global _memory_registry
+    ttl = getattr(settings, 'REMOTE_PRESENCE_TTL', 45)
+    if hasattr(channel_layer, 'connection') and hasattr(channel_layer, 'consistent_hash'):
+        return RedisPresenceRegistry(channel_layer, ttl=ttl)
+    layer_class = type(channel_layer)
+    if not isinstance(channel_layer, InMemoryChannelLayer) and layer_class not in _warned_layers:
+        _warned_layers.add(layer_class)
+        logger.warning(
+            f"Presence for {layer_class.__module__}.{layer_class.__name__} is process-local: "
+            f"with several workers each one only sees its own peers. Use channels_redis.core.RedisChannelLayer."
+        )
+    if _memory_registry is None:
+        _memory_registry = MemoryPresenceRegistry(ttl=ttl)
+    return _memory_registry
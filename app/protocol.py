@@ -0,0 +1,186 @@
+"""
+Compact binary frames for remote-input events.
+
+A frame is a fixed 9-byte big-endian struct:
+
+    version  uint8   PROTOCOL_VERSION
+    opcode   uint8   one of the OP_* constants
+    flags    uint8   mouse button index for button events, otherwise 0
+    x        uint16  pointer x for moves, otherwise 0
+    y        uint16  pointer y for moves, otherwise 0
+    key      uint16  key code for keyboard events, otherwise 0
+
+Several events can be sent in one message as a batch: a BATCH_HEADER
+(version, OP_BATCH, event count) followed by that many entries, each a uint16
+millisecond offset from the first event and then a regular frame.
+
+Key codes are the Unicode code point for single-character keys and
+NAMED_KEY_BASE + index into NAMED_KEYS for named keys. Clients opt in by
+offering SUBPROTOCOL when opening the WebSocket; the JSON envelope keeps
+working for everyone else. The encoder in user/dashboard.html mirrors this
+module and receives NAMED_KEYS from the server at connect.
+"""
+import struct
+
+PROTOCOL_VERSION = 1
+SUBPROTOCOL = 'remote.input.v1'
+
+FRAME = struct.Struct('!BBBHHH')
+BATCH_HEADER = struct.Struct('!BBH')
+BATCH_OFFSET = struct.Struct('!H')
+BATCH_ENTRY_SIZE = BATCH_OFFSET.size + FRAME.size
+
+OP_MOUSE_MOVE = 1
+OP_MOUSE_DOWN = 2
+OP_MOUSE_UP = 3
+OP_KEY_DOWN = 4
+OP_KEY_UP = 5
+OP_BATCH = 6
+
+BUTTONS = ('left', 'middle', 'right')
+
+NAMED_KEY_BASE = 0xE000
+NAMED_KEYS = (
+    'Enter', 'Tab', 'Backspace', 'Escape', 'Delete', 'Insert',
+    'Home', 'End', 'PageUp', 'PageDown',
+    'ArrowUp', 'ArrowDown', 'ArrowLeft', 'ArrowRight',
+    'Shift', 'Control', 'Alt', 'AltGraph', 'Meta', 'CapsLock', 'NumLock',
+    'ScrollLock', 'Pause', 'PrintScreen', 'ContextMenu',
+    'F1', 'F2', 'F3', 'F4', 'F5', 'F6', 'F7', 'F8', 'F9', 'F10', 'F11', 'F12',
+)
+
+_OPCODES = {
+    ('mouse', 'move'): OP_MOUSE_MOVE,
+    ('mouse', 'down'): OP_MOUSE_DOWN,
+    ('mouse', 'up'): OP_MOUSE_UP,
+    ('keyboard', 'down'): OP_KEY_DOWN,
+    ('keyboard', 'up'): OP_KEY_UP,
+}
+_EVENTS = {opcode: event for event, opcode in _OPCODES.items()}
+_NAMED_KEY_CODES = {name: NAMED_KEY_BASE + index for index, name in enumerate(NAMED_KEYS)}
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def encode_key(key):
+    if key in _NAMED_KEY_CODES:
+        return _NAMED_KEY_CODES[key]
+    if len(key) == 1 and ord(key) < NAMED_KEY_BASE:
+        return ord(key)
+    raise ProtocolError(f"Key {key!r} has no binary encoding")
+
+
+def decode_key(code):
+    if code >= NAMED_KEY_BASE:
+        try:
+            return NAMED_KEYS[code - NAMED_KEY_BASE]
+        except IndexError:
+            raise ProtocolError(f"Unknown named key code {code}")
+    return chr(code)
+
+
+def encode_button(button):
+    if isinstance(button, int):
+        index = button
+    elif button in BUTTONS:
+        index = BUTTONS.index(button)
+    else:
+        raise ProtocolError(f"Unknown mouse button {button!r}")
+    if not 0 <= index < len(BUTTONS):
+        raise ProtocolError(f"Unknown mouse button {button!r}")
+    return index
+
+
+def encode_event(data):
+    """
+    Encode a screen_data event dict into a binary frame
+    """
+    try:
+        opcode = _OPCODES[(data.get('type'), data.get('action'))]
+    except KeyError:
+        raise ProtocolError(f"Unsupported input event {data!r}")
+
+    flags = x = y = key = 0
+    if opcode == OP_MOUSE_MOVE:
+        x, y = data['x'], data['y']
+    elif opcode in (OP_MOUSE_DOWN, OP_MOUSE_UP):
+        flags = encode_button(data.get('button', 'left'))
+    else:
+        key = encode_key(data['key'])
+
+    try:
+        return FRAME.pack(PROTOCOL_VERSION, opcode, flags, x, y, key)
+    except struct.error as e:
+        raise ProtocolError(str(e))
+
+
+def decode_event(frame, offset=0):
+    """
+    Decode one binary frame back into the screen_data event dict
+    """
+    if len(frame) - offset < FRAME.size:
+        raise ProtocolError(f"Frame too short: {len(frame) - offset} bytes")
+
+    version, opcode, flags, x, y, key = FRAME.unpack_from(frame, offset)
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"Unsupported protocol version {version}")
+    try:
+        event_type, action = _EVENTS[opcode]
+    except KeyError:
+        raise ProtocolError(f"Unknown opcode {opcode}")
+
+    data = {'type': event_type, 'action': action}
+    if opcode == OP_MOUSE_MOVE:
+        data['x'] = x
+        data['y'] = y
+    elif event_type == 'mouse':
+        if flags >= len(BUTTONS):
+            raise ProtocolError(f"Unknown mouse button {flags}")
+        data['button'] = BUTTONS[flags]
+    else:
+        data['key'] = decode_key(key)
+    return data
+
+
+def encode_batch(events):
+    """
+    Encode a list of (offset_ms, event) pairs into one batch message
+    """
+    parts = [BATCH_HEADER.pack(PROTOCOL_VERSION, OP_BATCH, len(events))]
+    for offset, data in events:
+        try:
+            parts.append(BATCH_OFFSET.pack(offset))
+        except struct.error as e:
+            raise ProtocolError(str(e))
+        parts.append(encode_event(data))
+    return b''.join(parts)
+
+
+def decode_message(message):
+    """
+    Decode a single frame or a batch into a list of (offset_ms, event) pairs
+    """
+    if len(message) == FRAME.size:
+        return [(0, decode_event(message))]
+    if len(message) < BATCH_HEADER.size:
+        raise ProtocolError(f"Message too short: {len(message)} bytes")
+
+    version, opcode, count = BATCH_HEADER.unpack_from(message)
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"Unsupported protocol version {version}")
+    if opcode != OP_BATCH:
+        raise ProtocolError(f"Expected a batch, got opcode {opcode}")
+    if count == 0:
+        raise ProtocolError("Empty batch")
+    if len(message) != BATCH_HEADER.size + count * BATCH_ENTRY_SIZE:
+        raise ProtocolError(f"Batch of {count} events has wrong length {len(message)}")
+
+    events = []
+    position = BATCH_HEADER.size
+    for _ in range(count):
+        (offset,) = BATCH_OFFSET.unpack_from(message, position)
+        events.append((offset, decode_event(message, position + BATCH_OFFSET.size)))
+        position += BATCH_ENTRY_SIZE
+    return events
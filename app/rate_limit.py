@@ -0,0 +1,149 @@
+"""
+Per-connection token-bucket rate limits for RoomConsumer.
+
+Every connection gets one bucket per message class:
+
+    pointer     mouse events (moves, buttons)
+    key         keyboard events
+    signaling   offers, answers, ICE candidates, screen_ready, presence
+                queries, and messages rejected by validation
+
+An input batch takes one token per event of each class it contains, and
+every message takes at least one token. A message that finds its bucket
+empty is dropped. The first drop after a
+message of that class got through is answered with a throttle notice. If a
+client keeps sending more than REMOTE_RATE_LIMIT_CLOSE_AFTER dropped messages
+within one second, the connection is closed with CLOSE_CODE.
+
+Buckets refill lazily from the monotonic clock when they are checked, so an
+idle connection costs nothing.
+"""
+import time
+
+from django.conf import settings
+
+# Application close code (4000-4999): the client sent faster than its budget allows
+CLOSE_CODE = 4429
+
+ALLOW = 'allow'
+DROP = 'drop'
+NOTIFY = 'notify'
+CLOSE = 'close'
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic() if now is None else now
+
+    def refill(self, now):
+        tokens = self.tokens + (now - self.updated) * self.rate
+        self.tokens = tokens if tokens < self.burst else self.burst
+        self.updated = now
+
+    def retry_after(self, cost=1):
+        """
+        Seconds until `cost` tokens are available
+        """
+        return max(0.0, (cost - self.tokens) / self.rate)
+
+
+def event_class(event):
+    return 'pointer' if event.get('type') == 'mouse' else 'key'
+
+
+def input_costs(events):
+    """
+    Tokens per class for a list of (offset, event) pairs
+    """
+    costs = {}
+    for _, event in events:
+        message_class = event_class(event)
+        costs[message_class] = costs.get(message_class, 0) + 1
+    return costs
+
+
+class ConnectionRateLimiter:
+    def __init__(self, limits, close_after=None):
+        now = time.monotonic()
+        self.buckets = {
+            message_class: TokenBucket(rate, burst, now)
+            for message_class, (rate, burst) in limits.items()
+        }
+        self.close_after = close_after
+        self.throttled = set()
+        self.window_start = now
+        self.window_drops = 0
+        self.dropped = 0
+        # Class of the most recently dropped message
+        self.limited = None
+
+    def check(self, message_class, cost=1):
+        """
+        Take `cost` tokens of one class; see check_costs
+        """
+        return self.check_costs({message_class: cost})
+
+    def check_costs(self, costs):
+        """
+        Take tokens for every class in `costs` ({class: tokens}) if all of them
+        are available, and return ALLOW, DROP, NOTIFY (drop and tell the
+        client) or CLOSE. A message with no cost is charged as signaling.
+        """
+        if not costs:
+            costs = {'signaling': 1}
+        now = time.monotonic()
+        limited = None
+        for message_class, cost in costs.items():
+            bucket = self.buckets.get(message_class)
+            if bucket is None:
+                continue
+            bucket.refill(now)
+            if bucket.tokens < cost:
+                limited = message_class
+                break
+
+        if limited is None:
+            for message_class, cost in costs.items():
+                bucket = self.buckets.get(message_class)
+                if bucket is not None:
+                    bucket.tokens -= cost
+                    self.throttled.discard(message_class)
+            return ALLOW
+
+        self.dropped += 1
+        self.limited = limited
+        if now - self.window_start >= 1.0:
+            self.window_start = now
+            self.window_drops = 0
+        self.window_drops += 1
+        if self.close_after is not None and self.window_drops > self.close_after:
+            return CLOSE
+        if limited in self.throttled:
+            return DROP
+        self.throttled.add(limited)
+        return NOTIFY
+
+    def notice(self):
+        """
+        The throttle notice for the most recently dropped message
+        """
+        return {
+            'type': 'throttled',
+            'class': self.limited,
+            'retry_after': round(self.buckets[self.limited].retry_after(), 3)
+        }
+
+
+def get_rate_limiter():
+    """
+    Return a limiter for a new connection, or None when rate limiting is disabled
+    """
+    limits = getattr(settings, 'REMOTE_RATE_LIMITS', None)
+    if not limits:
+        return None
+    return ConnectionRateLimiter(limits, getattr(settings, 'REMOTE_RATE_LIMIT_CLOSE_AFTER', None))
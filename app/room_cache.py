@@ -0,0 +1,114 @@
+import logging
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+logger = logging.getLogger(__name__)
+
+_fallback_cache = None
+
+
+class RoomMembershipCache:
+    """
+    Caches who belongs to a room and whether it is active and accepted, keyed
+    by room_id, so RoomConsumer.connect can authorize without a query.
+
+    Views keep it current: create_room and accept_room store the room,
+    reject_room and end_room store the inactive state. Entries also expire
+    after `ttl` seconds. If the configured cache alias does not exist, a
+    process-local memory cache is used instead.
+
+    A process-local cache never sees updates made by views in other
+    processes, so its entries only live `local_ttl` seconds: an ended room
+    is then refused at most that long after the change.
+    """
+
+    fields = ('id', 'creator_id', 'receiver_id', 'is_active', 'is_accepted')
+
+    def __init__(self, cache_alias='default', ttl=300, local_ttl=5):
+        self.cache_alias = cache_alias
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+
+    @property
+    def cache(self):
+        global _fallback_cache
+        if self.cache_alias in settings.CACHES:
+            return caches[self.cache_alias]
+        if _fallback_cache is None:
+            _fallback_cache = LocMemCache('room-membership', {})
+        return _fallback_cache
+
+    @property
+    def is_process_local(self):
+        return isinstance(self.cache, LocMemCache)
+
+    @property
+    def entry_ttl(self):
+        return min(self.ttl, self.local_ttl) if self.is_process_local else self.ttl
+
+    def key(self, room_id):
+        return f"room-membership:{room_id}"
+
+    def entry(self, room):
+        return {field: getattr(room, field) for field in self.fields}
+
+    def store(self, room):
+        try:
+            self.cache.set(self.key(room.room_id), self.entry(room), self.entry_ttl)
+        except Exception as e:
+            logger.error(f"Error caching membership of room {room.room_id}: {str(e)}")
+
+    async def astore(self, room):
+        try:
+            await self.cache.aset(self.key(room.room_id), self.entry(room), self.entry_ttl)
+        except Exception as e:
+            logger.error(f"Error caching membership of room {room.room_id}: {str(e)}")
+
+    async def aget(self, room_id):
+        """
+        Return the cached membership entry for a room, or None on a miss
+        """
+        try:
+            return await self.cache.aget(self.key(room_id))
+        except Exception as e:
+            logger.error(f"Error reading membership of room {room_id}: {str(e)}")
+            return None
+
+
+_room_membership = None
+
+
+def get_room_membership():
+    """
+    Return the process-wide room membership cache configured from settings
+    """
+    global _room_membership
+    if _room_membership is None:
+        _room_membership = RoomMembershipCache(
+            cache_alias=getattr(settings, 'REMOTE_ROOM_CACHE', 'default'),
+            ttl=getattr(settings, 'REMOTE_ROOM_CACHE_TTL', 300),
+            local_ttl=getattr(settings, 'REMOTE_ROOM_CACHE_LOCAL_TTL', 5)
+        )
+    return _room_membership
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_room_cache(app_configs, **kwargs):
+    """
+    Deployments run several processes; room state changes must reach all of them
+    """
+    membership = RoomMembershipCache(getattr(settings, 'REMOTE_ROOM_CACHE', 'default'))
+    if not membership.is_process_local:
+        return []
+    return [checks.Warning(
+        "REMOTE_ROOM_CACHE is a process-local memory cache.",
+        hint=(
+            "Room state changes made in one process are not seen by the others, which "
+            "keep accepting connections to ended rooms for up to REMOTE_ROOM_CACHE_LOCAL_TTL "
+            "seconds. Point REMOTE_ROOM_CACHE at a shared cache such as Redis."
+        ),
+        id='app.W001',
+    )]
@@ -0,0 +1,144 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import codec
+
+
+def encode_envelope(payload):
+    """
+    Wrap a client-facing signaling payload for the channel layer.
+
+    The payload is serialized once by the sender and carried as `frame`;
+    receiving consumers forward that text as-is instead of re-encoding the
+    event. `type` and `sender_id` stay readable for dispatch and echo checks.
+    """
+    return {
+        'type': payload['type'],
+        'sender_id': payload.get('sender_id'),
+        'frame': codec.dumps(payload)
+    }
+
+
+def envelope_frame(event):
+    """
+    Return the text to send to the client for a received group event
+    """
+    frame = event.get('frame')
+    if frame is None:
+        frame = codec.dumps(event)
+    return frame
+
+
+class SignalingStateCache:
+    """
+    Remembers the pending offer of each room, and the candidates its author
+    gathered, so a peer that (re)connects before answering can be brought up
+    to date without waiting for a full renegotiation.
+
+    Every offer starts a negotiation with a fresh id; candidates and the
+    answer are stored under that id, so nothing from an earlier exchange is
+    ever mixed into the live one. Only the side that did not write the offer
+    gets a replay, and only while the offer is unanswered: the offerer's new
+    RTCPeerConnection has no local offer to apply an answer to, and once an
+    answer is in, the offerer's connection is stable and would reject a
+    second answer to a replayed offer.
+
+    Entries live in Django's cache framework with a TTL, so the store is
+    process-local with the default local-memory cache and shared between
+    workers when a Redis cache is configured. Both roles write the room's
+    entries, so an answer is tied to whichever offer is current when it is
+    recorded; descriptions are recorded before they are forwarded, so the
+    offer being answered is always stored first.
+    """
+
+    def __init__(self, cache_alias='default', ttl=120, max_candidates=64):
+        self.cache_alias = cache_alias
+        self.ttl = ttl
+        self.max_candidates = max_candidates
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def key(self, room_id, name):
+        return f"signaling:{room_id}:{name}"
+
+    async def record_description(self, room_id, role, payload, frame):
+        """
+        Store an offer as a new negotiation, or mark the current one answered
+        when the other side answers it
+        """
+        if payload['type'] == 'webrtc.offer':
+            offer = {'role': role, 'frame': frame, 'negotiation': uuid.uuid4().hex}
+            await self.cache.aset(self.key(room_id, 'offer'), offer, self.ttl)
+            return
+        offer = await self.cache.aget(self.key(room_id, 'offer'))
+        if offer and offer['role'] != role:
+            await self.cache.aset(self.key(room_id, f"answered:{offer['negotiation']}"), True, self.ttl)
+
+    async def record_candidates(self, room_id, role, candidates):
+        """
+        Store candidates gathered by the author of the current offer; the
+        answerer's candidates are never replayed, so they are not kept
+        """
+        offer = await self.cache.aget(self.key(room_id, 'offer'))
+        if not offer or offer['role'] != role:
+            return
+        key = self.key(room_id, f"candidates:{offer['negotiation']}")
+        stored = await self.cache.aget(key) or []
+        stored = (stored + candidates)[-self.max_candidates:]
+        await self.cache.aset(key, stored, self.ttl)
+
+    async def replay_frames(self, room_id, role):
+        """
+        Return the frames a newly connected peer of `role` should receive, in
+        negotiation order: the pending offer, then its author's candidates.
+        """
+        offer = await self.cache.aget(self.key(room_id, 'offer'))
+        if not offer or offer['role'] == role:
+            return []
+        negotiation = offer['negotiation']
+        entries = await self.cache.aget_many([
+            self.key(room_id, f"answered:{negotiation}"),
+            self.key(room_id, f"candidates:{negotiation}"),
+        ])
+        if entries.get(self.key(room_id, f"answered:{negotiation}")):
+            return []
+        frames = [offer['frame']]
+        candidates = entries.get(self.key(room_id, f"candidates:{negotiation}"))
+        if candidates:
+            frames.append(codec.dumps({
+                'type': 'ice_candidates',
+                'candidates': candidates,
+                'end_of_candidates': False,
+                'roomId': room_id
+            }))
+        return frames
+
+    async def clear(self, room_id):
+        offer = await self.cache.aget(self.key(room_id, 'offer'))
+        keys = [self.key(room_id, 'offer')]
+        if offer:
+            keys += [
+                self.key(room_id, f"{name}:{offer['negotiation']}")
+                for name in ('answered', 'candidates')
+            ]
+        await self.cache.adelete_many(keys)
+
+
+_signaling_state = None
+
+
+def get_signaling_state():
+    """
+    Return the process-wide signaling state cache configured from settings
+    """
+    global _signaling_state
+    if _signaling_state is None:
+        _signaling_state = SignalingStateCache(
+            cache_alias=getattr(settings, 'REMOTE_SIGNALING_CACHE', 'default'),
+            ttl=getattr(settings, 'REMOTE_SIGNALING_STATE_TTL', 120)
+        )
+    return _signaling_state
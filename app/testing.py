@@ -0,0 +1,25 @@
+"""
+In-memory setup shared by the tests, benchmarks and load tests: a channel
+layer that needs no Redis, and rooms that exist only in the membership cache
+so no database rows are written.
+"""
+from .models import CustomUser, Room
+from .room_cache import get_room_membership
+
+IN_MEMORY_CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+async def cached_room(room_id, index):
+    """
+    Return (room, creator, receiver) for an accepted, active room that is
+    only stored in the membership cache. Users are unsaved; `index` keeps
+    their ids and user ids distinct between rooms.
+    """
+    creator = CustomUser(id=2 * index + 1, username=f'{room_id}_creator', user_id=str(1000000000 + 2 * index))
+    receiver = CustomUser(id=2 * index + 2, username=f'{room_id}_receiver', user_id=str(1000000001 + 2 * index))
+    room = Room(
+        room_id=room_id, creator_id=creator.id, receiver_id=receiver.id,
+        is_active=True, is_accepted=True
+    )
+    await get_room_membership().astore(room)
+    return room, creator, receiver
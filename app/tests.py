@@ -1,3 +1,1251 @@
-from django.test import TestCase
+import asyncio
+import json
+import sys
+import threading
+import time
 
-# Create your tests here.
+from contextlib import contextmanager
+from unittest import mock, skipUnless
+
+from django.core import signing
+from django.db import connection, connections
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+
+from .injection import InputInjector
+from . import codec, consumers, input_backends, metrics, views
+from .input_backends import InputBackend, RecordingBackend
+from .models import CustomUser, Room, UserIdSequence
+from .input_latency import STAGES, InputLatencyTracker, LatencyHistogram, get_input_latency_tracker
+from .client_messages import InvalidMessage, parse_client_message
+from .input_pipeline import InputPipeline
+from .notifications import notification_group
+from .presence import MemoryPresenceRegistry, presence_snapshot
+from . import presence, rate_limit
+from . import protocol
+from .room_cache import RoomMembershipCache, check_room_cache, get_room_membership
+from .routing import websocket_urlpatterns
+from .signaling import SignalingStateCache, encode_envelope, get_signaling_state
+from .testing import IN_MEMORY_CHANNEL_LAYERS
+from .user_ids import USER_ID_MIN, USER_ID_SPACE, permute, user_id_for
+
+
+def mouse_move(x, y):
+    return {'type': 'mouse', 'action': 'move', 'x': x, 'y': y}
+
+
+class InputPipelineTests(SimpleTestCase):
+    async def drain(self, pipeline):
+        for _ in range(50):
+            if not pipeline.events and pipeline.pending_move is None:
+                break
+            await asyncio.sleep(0.01)
+
+    async def test_moves_are_coalesced_latest_wins(self):
+        injected = []
+
+        async def handler(data):
+            injected.append(data)
+
+        pipeline = InputPipeline(handler)
+        for i in range(100):
+            pipeline.submit(mouse_move(i, i))
+        pipeline.start()
+        await self.drain(pipeline)
+        await pipeline.stop()
+
+        self.assertEqual(injected, [mouse_move(99, 99)])
+        self.assertEqual(pipeline.coalesced, 99)
+
+    async def test_button_and_key_events_keep_order(self):
+        injected = []
+
+        async def handler(data):
+            injected.append(data)
+
+        down = {'type': 'mouse', 'action': 'down', 'button': 'left'}
+        key = {'type': 'keyboard', 'action': 'down', 'key': 'a'}
+        pipeline = InputPipeline(handler)
+        pipeline.submit(mouse_move(1, 1))
+        pipeline.submit(mouse_move(2, 2))
+        pipeline.submit(down)
+        pipeline.submit(key)
+        pipeline.submit(mouse_move(3, 3))
+        pipeline.start()
+        await self.drain(pipeline)
+        await pipeline.stop()
+
+        self.assertEqual(injected, [mouse_move(2, 2), down, key, mouse_move(3, 3)])
+        self.assertEqual(pipeline.coalesced, 1)
+
+    async def test_compressed_batch_collapses_move_runs(self):
+        injected = []
+
+        async def handler(data):
+            injected.append(data)
+
+        down = {'type': 'mouse', 'action': 'down', 'button': 'left'}
+        pipeline = InputPipeline(handler)
+        pipeline.submit_batch([
+            (0.000, mouse_move(1, 1)),
+            (0.004, mouse_move(2, 2)),
+            (0.008, down),
+            (0.012, mouse_move(3, 3)),
+            (0.016, mouse_move(4, 4)),
+        ])
+        pipeline.start()
+        await self.drain(pipeline)
+        await pipeline.stop()
+
+        self.assertEqual(len(injected), 1)
+        self.assertEqual(
+            [data for _, data in injected[0]['events']],
+            [mouse_move(2, 2), down, mouse_move(4, 4)]
+        )
+        self.assertEqual(pipeline.coalesced, 2)
+
+
+class InputBackendTests(SimpleTestCase):
+    def test_events_map_to_backend_primitives(self):
+        calls = []
+
+        class Backend(InputBackend):
+            def move(self, x, y):
+                calls.append(('move', x, y))
+
+            def mouse_down(self, button):
+                calls.append(('mouse_down', button))
+
+            def mouse_up(self, button):
+                calls.append(('mouse_up', button))
+
+            def key_down(self, key):
+                calls.append(('key_down', key))
+
+            def key_up(self, key):
+                calls.append(('key_up', key))
+
+        backend = Backend()
+        for data in (
+            mouse_move(3, 4),
+            {'type': 'mouse', 'action': 'down', 'button': 'left'},
+            {'type': 'keyboard', 'action': 'down', 'key': 'Enter'},
+            {'type': 'keyboard', 'action': 'up', 'key': 'Enter'},
+            {'type': 'mouse', 'action': 'up', 'button': 'left'},
+        ):
+            backend.inject(data)
+        self.assertEqual(calls, [
+            ('move', 3, 4), ('mouse_down', 'left'), ('key_down', 'Enter'),
+            ('key_up', 'Enter'), ('mouse_up', 'left'),
+        ])
+
+    @mock.patch.object(input_backends, '_input_available', None)
+    def test_capability_check_does_not_import_gui_modules(self):
+        with mock.patch.dict('os.environ', clear=True), mock.patch('sys.platform', 'linux'):
+            self.assertIsNotNone(input_backends.PyAutoGUIBackend.check())
+            self.assertFalse(input_backends.input_injection_available())
+        self.assertNotIn('pyautogui', sys.modules)
+
+    @mock.patch.object(input_backends, '_input_available', None)
+    @override_settings(REMOTE_INPUT_BACKEND='app.input_backends.RecordingBackend', REMOTE_INPUT_ENABLED=False)
+    def test_injection_can_be_disabled(self):
+        self.assertFalse(input_backends.input_injection_available())
+
+    def test_recording_backend_behind_injector(self):
+        backend = RecordingBackend()
+        injector = InputInjector(backend.inject)
+        events = [mouse_move(1, 1), {'type': 'keyboard', 'action': 'down', 'key': 'a'}]
+        for data in events:
+            injector.submit(data).result(timeout=1)
+        self.assertEqual([data for _, data in backend.events], events)
+
+
+class LatencyHistogramTests(SimpleTestCase):
+    def test_percentiles_are_bucket_upper_bounds(self):
+        histogram = LatencyHistogram()
+        for ms in range(1, 101):
+            histogram.observe(ms / 1000)
+        summary = histogram.summary()
+        self.assertEqual(summary['count'], 100)
+        # Buckets grow by 25%, so estimates are at most 25% high and never low
+        for key, exact in (('p50_ms', 50), ('p95_ms', 95), ('p99_ms', 99)):
+            self.assertGreaterEqual(summary[key], exact)
+            self.assertLessEqual(summary[key], exact * 1.25)
+        self.assertEqual(summary['max_ms'], 100)
+
+
+class InputLatencyTrackerTests(SimpleTestCase):
+    def test_least_recently_used_room_is_evicted(self):
+        tracker = InputLatencyTracker(max_rooms=2)
+        tracker.histograms('busy')
+        tracker.histograms('quiet')
+        tracker.histograms('busy')
+        tracker.histograms('new')
+        self.assertEqual(list(tracker.rooms), ['busy', 'new'])
+
+
+class MetricsTests(SimpleTestCase):
+    def test_thread_shards_are_summed(self):
+        counter = metrics.Counter('test_events_total', 'Test events', ['kind'])
+        threads = [threading.Thread(target=lambda: [counter.inc(kind='a') for _ in range(1000)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counter.samples(), {('a',): 4000})
+
+    def test_exited_thread_shards_are_retired(self):
+        histogram = metrics.Histogram('test_retired_seconds', 'Test latency', buckets=(0.1,))
+        for _ in range(20):
+            thread = threading.Thread(target=histogram.observe, args=(0.0625,))
+            thread.start()
+            thread.join()
+        histogram.observe(0.5)
+        self.assertEqual(histogram.samples(), {(): [[20, 1], 20 * 0.0625 + 0.5, 21]})
+        self.assertEqual(len(histogram._shards), 1)
+
+    def test_render_merges_worker_snapshots(self):
+        registry = metrics.Registry()
+        histogram = registry.register(metrics.Histogram('test_seconds', 'Test latency', ['op'], buckets=(0.1, 1.0)))
+        histogram.observe(0.05, op='send')
+        histogram.observe(0.5, op='send')
+        snapshot = registry.snapshot()
+
+        text = metrics.render(metrics.merge_snapshots([snapshot, snapshot]))
+        self.assertIn('# TYPE test_seconds histogram', text)
+        self.assertIn('test_seconds_bucket{op="send",le="0.1"} 2', text)
+        self.assertIn('test_seconds_bucket{op="send",le="1.0"} 4', text)
+        self.assertIn('test_seconds_bucket{op="send",le="+Inf"} 4', text)
+        self.assertIn('test_seconds_count{op="send"} 4', text)
+
+    @override_settings(REMOTE_METRICS_TOKEN='scrape-token')
+    def test_endpoint_includes_other_workers(self):
+        publisher = metrics.get_publisher()
+        other = metrics.SnapshotPublisher(publisher.cache_alias, publisher.interval)
+        other.worker_id = 'other-host:1'
+        before = metrics.errors.samples().get(('test_worker',), 0)
+        metrics.errors.inc(where='test_worker')
+        other.publish()
+        try:
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-token')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(f'remote_errors_total{{where="test_worker"}} {2 * (before + 1)}', response.content.decode())
+        finally:
+            other.cache.delete(other.key(other.worker_id))
+
+
+class MetricsAccessTests(TestCase):
+    @override_settings(REMOTE_METRICS_TOKEN=None)
+    def test_endpoint_is_superuser_only_without_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(CustomUser.objects.create_user('regular'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(CustomUser.objects.create_user('admin', user_type='super_user'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+
+class CodecTests(SimpleTestCase):
+    payload = {
+        'type': 'webrtc.offer',
+        'offer': {'type': 'offer', 'sdp': 'v=0\r\no=- 4611731400430051336 2 IN IP4 127.0.0.1\r\n'},
+        'candidate': {'candidate': 'candidate:0 1 udp 2122260223 10.0.0.1 50000 typ host', 'sdpMLineIndex': 0},
+        'events': [[16, {'type': 'mouse', 'action': 'move', 'x': 0.5, 'y': 1080}]],
+        'sender_id': 'ünïcode',
+        'ready': True,
+        'missing': None,
+    }
+
+    def test_codecs_round_trip_and_agree(self):
+        for name in codec.available_codecs():
+            with self.subTest(codec=name):
+                json_codec = codec.get_codec(name)
+                self.assertEqual(json_codec.loads(json_codec.dumps(self.payload)), self.payload)
+                self.assertEqual(json_codec.loads(json_codec.dumpb(self.payload)), self.payload)
+                self.assertEqual(json.loads(json_codec.dumps(self.payload)), self.payload)
+                for invalid in ('{"type": ', b'{"type": ', b'"\xff"'):
+                    with self.assertRaises(codec.DecodeError):
+                        json_codec.loads(invalid)
+
+    def test_json_response(self):
+        response = codec.JsonResponse({'success': False, 'error': 'Room not found'}, status=404)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content), {'success': False, 'error': 'Room not found'})
+
+
+class ClientMessageTests(SimpleTestCase):
+    def reason(self, message):
+        with self.assertRaises(InvalidMessage) as raised:
+            parse_client_message(json.dumps(message))
+        return raised.exception.reason
+
+    def test_known_messages_pass(self):
+        for message in (
+            {'type': 'screen_data', 'data': {'type': 'mouse', 'action': 'move', 'x': 0.5, 'y': 10}, 'ts': 1.5},
+            {'type': 'screen_data_batch', 'events': [{'t': 4, 'data': {'type': 'keyboard', 'action': 'up', 'key': 'a'}}]},
+            {'type': 'ice_candidate', 'candidate': {'candidate': 'candidate:0 1 udp 1 10.0.0.1 5000 typ host', 'sdpMid': '0', 'sdpMLineIndex': 0}},
+            {'type': 'ice_candidate', 'candidate': None},
+            {'type': 'webrtc.answer', 'answer': {'type': 'answer', 'sdp': 'v=0'}, 'roomId': 'room'},
+            {'type': 'screen_ready'},
+        ):
+            self.assertEqual(parse_client_message(json.dumps(message)), (message['type'], message))
+
+    def test_rejection_reasons(self):
+        self.assertEqual(self.reason(['screen_ready']), 'malformed')
+        self.assertEqual(self.reason({'type': ['screen_ready']}), 'unknown_type')
+        self.assertEqual(self.reason({'type': 'user_connected'}), 'server_only')
+        self.assertEqual(self.reason({'type': 'webrtc.offer', 'offer': {'type': 'offer', 'sdp': 'x' * 70000}}), 'invalid')
+        self.assertEqual(self.reason({'type': 'screen_data', 'data': {'type': 'mouse', 'action': 'move', 'x': True, 'y': 1}}), 'invalid')
+        self.assertEqual(self.reason({'type': 'screen_data_batch', 'events': [{'t': -1, 'data': {}}]}), 'invalid')
+        self.assertEqual(self.reason({'type': 'screen_data_batch', 'events': []}), 'invalid')
+        with override_settings(REMOTE_INPUT_BATCH_MAX_EVENTS=2):
+            key = {'data': {'type': 'keyboard', 'action': 'down', 'key': 'a'}}
+            self.assertEqual(self.reason({'type': 'screen_data_batch', 'events': [key] * 3}), 'invalid')
+        self.assertEqual(self.reason({'type': 'screen_data', 'data': {'type': 'mouse', 'action': 'down', 'button': 3}}), 'invalid')
+
+    def test_numeric_buttons_become_names(self):
+        _, data = parse_client_message(json.dumps({
+            'type': 'screen_data_batch',
+            'events': [{'t': 0, 'data': {'type': 'mouse', 'action': 'down', 'button': 2}},
+                       {'t': 5, 'data': {'type': 'keyboard', 'action': 'down', 'key': 'a'}}]
+        }))
+        self.assertEqual(data['events'][0]['data']['button'], 'right')
+
+    def test_unsupported_button_is_dropped_from_batch(self):
+        key_up = {'type': 'keyboard', 'action': 'up', 'key': 'a'}
+        _, data = parse_client_message(json.dumps({
+            'type': 'screen_data_batch',
+            'events': [{'t': 0, 'data': {'type': 'mouse', 'action': 'down', 'button': 3}},
+                       {'t': 5, 'data': key_up},
+                       {'t': 9, 'data': {'type': 'mouse', 'action': 'up', 'button': 4}}]
+        }))
+        self.assertEqual(data['events'], [{'t': 5, 'data': key_up}])
+        self.assertEqual(self.reason({
+            'type': 'screen_data_batch',
+            'events': [{'t': 0, 'data': {'type': 'mouse', 'action': 'down', 'button': 3}}]
+        }), 'invalid')
+
+
+class RateLimiterTests(SimpleTestCase):
+    def test_bucket_allows_burst_then_refills(self):
+        now = [100.0]
+        with mock.patch.object(rate_limit.time, 'monotonic', lambda: now[0]):
+            limiter = rate_limit.ConnectionRateLimiter({'key': (10, 3)}, close_after=4)
+            self.assertEqual([limiter.check('key') for _ in range(3)], [rate_limit.ALLOW] * 3)
+            self.assertEqual(limiter.check('key'), rate_limit.NOTIFY)
+            self.assertEqual(limiter.notice(), {'type': 'throttled', 'class': 'key', 'retry_after': 0.1})
+            self.assertEqual(limiter.check('key'), rate_limit.DROP)
+            # Classes without a bucket are not limited
+            self.assertEqual(limiter.check('pointer'), rate_limit.ALLOW)
+
+            now[0] += 0.25
+            self.assertEqual(limiter.check('key'), rate_limit.ALLOW)
+            self.assertEqual(limiter.check('key'), rate_limit.ALLOW)
+            self.assertEqual(limiter.check('key'), rate_limit.NOTIFY)
+            self.assertEqual(limiter.check('key'), rate_limit.DROP)
+            self.assertEqual(limiter.check('key'), rate_limit.CLOSE)
+
+    def test_batches_take_all_classes_or_nothing(self):
+        limiter = rate_limit.ConnectionRateLimiter({'pointer': (1, 5), 'key': (1, 1)})
+        costs = rate_limit.input_costs([
+            (0, {'type': 'mouse', 'action': 'move', 'x': 1, 'y': 1}),
+            (0, {'type': 'keyboard', 'action': 'down', 'key': 'a'}),
+            (0, {'type': 'keyboard', 'action': 'up', 'key': 'a'}),
+        ])
+        self.assertEqual(costs, {'pointer': 1, 'key': 2})
+        self.assertEqual(limiter.check_costs(costs), rate_limit.NOTIFY)
+        self.assertEqual(limiter.buckets['pointer'].tokens, 5)
+
+
+class InputInjectorTests(SimpleTestCase):
+    def test_events_are_injected_in_submission_order(self):
+        injected = []
+        injector = InputInjector(injected.append)
+        keys = [
+            {'type': 'keyboard', 'action': action, 'key': key}
+            for key in 'abc' for action in ('down', 'up')
+        ]
+        futures = [injector.submit(key) for key in keys]
+
+        self.assertTrue(all(future.result(timeout=1) for future in futures))
+        self.assertEqual(injected, keys)
+
+    def test_full_queue_evicts_replaced_moves_but_keeps_keys(self):
+        release = threading.Event()
+        injected = []
+
+        def inject(data):
+            release.wait()
+            injected.append(data)
+
+        injector = InputInjector(inject, maxsize=2, max_move_age=60)
+        blocker = injector.submit(mouse_move(0, 0))
+        while injector.stats()['queued']:
+            time.sleep(0.001)
+        first = injector.submit(mouse_move(1, 1))
+        second = injector.submit(mouse_move(2, 2))
+        last = injector.submit(mouse_move(3, 3))
+        key = injector.submit({'type': 'keyboard', 'action': 'down', 'key': 'a'})
+        release.set()
+
+        self.assertTrue(key.result(timeout=1))
+        self.assertTrue(blocker.result(timeout=1))
+        self.assertTrue(last.result(timeout=1))
+        self.assertFalse(first.result(timeout=1))
+        self.assertFalse(second.result(timeout=1))
+        self.assertEqual(injector.stats()['dropped_moves'], 2)
+        self.assertEqual(injected, [mouse_move(0, 0), mouse_move(3, 3), {'type': 'keyboard', 'action': 'down', 'key': 'a'}])
+
+    def test_stale_move_before_click_is_injected(self):
+        release = threading.Event()
+        injected = []
+
+        def inject(data):
+            if data['type'] == 'keyboard':
+                release.wait()
+            injected.append(data)
+
+        injector = InputInjector(inject, max_move_age=0.01)
+        key = {'type': 'keyboard', 'action': 'down', 'key': 'a'}
+        click = {'type': 'mouse', 'action': 'down', 'button': 'left'}
+        injector.submit(key)
+        move = injector.submit(mouse_move(500, 500))
+        down = injector.submit(click)
+        time.sleep(0.05)
+        release.set()
+
+        self.assertTrue(down.result(timeout=1))
+        self.assertTrue(move.result(timeout=1))
+        self.assertEqual(injected, [key, mouse_move(500, 500), click])
+        self.assertEqual(injector.stats()['stale_moves'], 0)
+
+    def test_stale_move_replaced_by_later_move_is_skipped(self):
+        release = threading.Event()
+        injected = []
+
+        def inject(data):
+            if data['type'] == 'keyboard':
+                release.wait()
+            injected.append(data)
+
+        injector = InputInjector(inject, max_move_age=0.01)
+        injector.submit({'type': 'keyboard', 'action': 'down', 'key': 'a'})
+        stale = injector.submit(mouse_move(1, 1))
+        latest = injector.submit(mouse_move(2, 2))
+        time.sleep(0.05)
+        release.set()
+
+        self.assertFalse(stale.result(timeout=1))
+        self.assertTrue(latest.result(timeout=1))
+        self.assertEqual(injected[1:], [mouse_move(2, 2)])
+
+    def test_batch_keeps_spacing_when_preserving_timing(self):
+        injected = []
+        injector = InputInjector(lambda data: injected.append((time.monotonic(), data)))
+        batch = {
+            'type': 'batch',
+            'events': [(0, mouse_move(1, 1)), (0.05, mouse_move(2, 2))],
+            'preserve_timing': True,
+        }
+
+        self.assertTrue(injector.submit(batch).result(timeout=1))
+        self.assertEqual([data for _, data in injected], [mouse_move(1, 1), mouse_move(2, 2)])
+        self.assertGreaterEqual(injected[1][0] - injected[0][0], 0.04)
+
+    def test_batch_sleep_is_capped(self):
+        injected = []
+        injector = InputInjector(lambda data: injected.append(time.monotonic()), max_batch_delay=0.05)
+        batch = {
+            'type': 'batch',
+            'events': [(0, mouse_move(1, 1)), (0.02, mouse_move(2, 2)), (5, mouse_move(3, 3))],
+            'preserve_timing': True,
+        }
+
+        self.assertTrue(injector.submit(batch).result(timeout=1))
+        self.assertGreaterEqual(injected[1] - injected[0], 0.015)
+        self.assertLess(injected[2] - injected[0], 0.5)
+
+
+class InputProtocolTests(SimpleTestCase):
+    def test_round_trip(self):
+        events = [
+            mouse_move(0, 0),
+            mouse_move(65535, 1080),
+            {'type': 'mouse', 'action': 'down', 'button': 'left'},
+            {'type': 'mouse', 'action': 'up', 'button': 'right'},
+            {'type': 'keyboard', 'action': 'down', 'key': 'a'},
+            {'type': 'keyboard', 'action': 'up', 'key': 'é'},
+            {'type': 'keyboard', 'action': 'down', 'key': 'Enter'},
+            {'type': 'keyboard', 'action': 'up', 'key': 'F12'},
+        ]
+        for event in events:
+            frame = protocol.encode_event(event)
+            self.assertEqual(len(frame), protocol.FRAME.size)
+            self.assertEqual(protocol.decode_event(frame), event)
+
+    def test_numeric_button_is_normalized(self):
+        frame = protocol.encode_event({'type': 'mouse', 'action': 'down', 'button': 2})
+        self.assertEqual(protocol.decode_event(frame)['button'], 'right')
+
+    def test_unencodable_events_are_rejected(self):
+        for event in [
+            mouse_move(-1, 0),
+            mouse_move(70000, 0),
+            {'type': 'keyboard', 'action': 'down', 'key': 'MediaPlayPause'},
+            {'type': 'screen', 'action': 'move'},
+        ]:
+            with self.assertRaises(protocol.ProtocolError):
+                protocol.encode_event(event)
+
+    def test_batch_round_trip(self):
+        events = [
+            (0, mouse_move(10, 20)),
+            (8, {'type': 'mouse', 'action': 'down', 'button': 'left'}),
+            (16, {'type': 'keyboard', 'action': 'down', 'key': 'Shift'}),
+        ]
+        message = protocol.encode_batch(events)
+        self.assertEqual(len(message), protocol.BATCH_HEADER.size + 3 * protocol.BATCH_ENTRY_SIZE)
+        self.assertEqual(protocol.decode_message(message), events)
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.decode_message(message[:-1])
+
+    def test_single_frame_decodes_as_message(self):
+        frame = protocol.encode_event(mouse_move(5, 6))
+        self.assertEqual(protocol.decode_message(frame), [(0, mouse_move(5, 6))])
+
+    def test_invalid_frames_are_rejected(self):
+        frame = bytearray(protocol.encode_event(mouse_move(1, 2)))
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.decode_event(bytes(frame[:-1]))
+        frame[0] = protocol.PROTOCOL_VERSION + 1
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.decode_event(bytes(frame))
+        frame[0], frame[1] = protocol.PROTOCOL_VERSION, 99
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.decode_event(bytes(frame))
+
+
+class SignalingStateCacheTests(SimpleTestCase):
+    offer = {'type': 'webrtc.offer', 'offer': {'sdp': 'o'}, 'sender_id': '1'}
+    answer = {'type': 'webrtc.answer', 'answer': {'sdp': 'a'}, 'sender_id': '2'}
+
+    async def replay_types(self, state, room_id, role):
+        return [json.loads(frame)['type'] for frame in await state.replay_frames(room_id, role)]
+
+    async def test_pending_offer_is_replayed_to_answerer_only(self):
+        state = SignalingStateCache()
+        await state.clear('room_replay')
+        await state.record_description('room_replay', 'creator', self.offer, encode_envelope(self.offer)['frame'])
+        await state.record_candidates('room_replay', 'creator', [{'candidate': 'c1'}])
+        await state.record_candidates('room_replay', 'receiver', [{'candidate': 'r1'}])
+
+        frames = [json.loads(frame) for frame in await state.replay_frames('room_replay', 'receiver')]
+        self.assertEqual([frame['type'] for frame in frames], ['webrtc.offer', 'ice_candidates'])
+        self.assertEqual(frames[1]['candidates'], [{'candidate': 'c1'}])
+        # The offerer's new connection has no local offer to apply anything to
+        self.assertEqual(await state.replay_frames('room_replay', 'creator'), [])
+
+    async def test_answered_offer_is_not_replayed(self):
+        state = SignalingStateCache()
+        await state.clear('room_answered')
+        await state.record_description('room_answered', 'creator', self.offer, encode_envelope(self.offer)['frame'])
+        await state.record_candidates('room_answered', 'creator', [{'candidate': 'c1'}])
+        await state.record_description('room_answered', 'receiver', self.answer, encode_envelope(self.answer)['frame'])
+
+        self.assertEqual(await state.replay_frames('room_answered', 'receiver'), [])
+        self.assertEqual(await state.replay_frames('room_answered', 'creator'), [])
+
+    async def test_new_offer_starts_a_new_negotiation(self):
+        state = SignalingStateCache()
+        await state.clear('room_reset')
+        await state.record_description('room_reset', 'creator', self.offer, encode_envelope(self.offer)['frame'])
+        await state.record_candidates('room_reset', 'creator', [{'candidate': 'c1'}])
+        await state.record_description('room_reset', 'receiver', self.answer, encode_envelope(self.answer)['frame'])
+        # The receiver renegotiates: only its offer is live, without the old candidates
+        await state.record_description('room_reset', 'receiver', self.offer, encode_envelope(self.offer)['frame'])
+
+        self.assertEqual(await self.replay_types(state, 'room_reset', 'creator'), ['webrtc.offer'])
+        self.assertEqual(await state.replay_frames('room_reset', 'receiver'), [])
+
+        await state.clear('room_reset')
+        self.assertEqual(await state.replay_frames('room_reset', 'creator'), [])
+
+
+class PresenceRegistryTests(SimpleTestCase):
+    async def test_members_expire_without_heartbeat(self):
+        presence = MemoryPresenceRegistry(ttl=0.05)
+        await presence.join('room_presence', 'creator', '1000000001', 'channel.a')
+        await presence.join('room_presence', 'receiver', '1000000002', 'channel.b')
+        self.assertEqual((await presence.get('room_presence', 'receiver'))['channel_name'], 'channel.b')
+
+        await asyncio.sleep(0.03)
+        await presence.join('room_presence', 'creator', '1000000001', 'channel.a')
+        await asyncio.sleep(0.03)
+        self.assertEqual(
+            presence_snapshot('room_presence', await presence.members('room_presence'))['members'],
+            [{'role': 'creator', 'user_id': '1000000001'}]
+        )
+
+    def test_unsupported_layer_warns_once(self):
+        class PubSubLayer:
+            pass
+
+        with mock.patch.object(presence, '_warned_layers', set()):
+            with self.assertLogs('app.presence', 'WARNING') as logs:
+                self.assertIsInstance(presence.get_presence_registry(PubSubLayer()), MemoryPresenceRegistry)
+                presence.get_presence_registry(PubSubLayer())
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('process-local', logs.output[0])
+
+    async def test_leave_keeps_a_newer_connection(self):
+        presence = MemoryPresenceRegistry()
+        await presence.join('room_rejoin', 'receiver', '1000000002', 'channel.old')
+        await presence.join('room_rejoin', 'receiver', '1000000002', 'channel.new')
+        await presence.leave('room_rejoin', 'receiver', 'channel.old')
+        self.assertEqual((await presence.get('room_rejoin', 'receiver'))['channel_name'], 'channel.new')
+        await presence.leave('room_rejoin', 'receiver', 'channel.new')
+        self.assertIsNone(await presence.get('room_rejoin', 'receiver'))
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, REMOTE_SIGNALING_POLL_TIMEOUT=1)
+class HttpSignalingTests(TestCase):
+    def setUp(self):
+        self.creator = CustomUser.objects.create_user('creator')
+        self.receiver = CustomUser.objects.create_user('receiver')
+        self.outsider = CustomUser.objects.create_user('outsider')
+        self.room = Room.objects.create(
+            room_id='room_http', creator=self.creator, receiver=self.receiver, is_accepted=True
+        )
+
+    async def test_offer_reaches_long_poll(self):
+        await self.async_client.aforce_login(self.receiver)
+        url = reverse('poll_signaling', args=[self.room.room_id])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.json()['messages'][0]['type'], 'presence')
+        token = response.json()['token']
+        poll = asyncio.ensure_future(self.async_client.get(url, {'token': token}))
+        await asyncio.sleep(0.1)
+
+        await self.async_client.aforce_login(self.creator)
+        response = await self.async_client.post(
+            reverse('send_offer', args=[self.room.room_id]),
+            data={'offer': {'type': 'offer', 'sdp': 'v=0'}},
+            content_type='application/json'
+        )
+        self.assertEqual(response.json(), {'success': True})
+
+        messages = (await poll).json()['messages']
+        self.assertEqual([message['type'] for message in messages], ['webrtc.offer'])
+        self.assertEqual(messages[0]['offer']['sdp'], 'v=0')
+
+    async def test_unused_poll_channel_leaves_group_and_presence(self):
+        await self.async_client.aforce_login(self.receiver)
+        response = await self.async_client.get(reverse('poll_signaling', args=[self.room.room_id]))
+        channel_name = signing.loads(response.json()['token'], salt='signaling-poll')['channel']
+        channel_layer = get_channel_layer()
+        registry = presence.get_presence_registry(channel_layer)
+        self.assertIn(channel_name, channel_layer.groups[self.room.room_id])
+        self.assertEqual((await registry.get(self.room.room_id, 'receiver'))['channel_name'], channel_name)
+
+        await asyncio.sleep(1.3)
+        self.assertNotIn(channel_name, channel_layer.groups.get(self.room.room_id, {}))
+        self.assertIsNone(await registry.get(self.room.room_id, 'receiver'))
+        self.assertNotIn(channel_name, views._poll_channels)
+
+    async def test_token_from_another_worker_gets_a_fresh_channel(self):
+        await self.async_client.aforce_login(self.receiver)
+        url = reverse('poll_signaling', args=[self.room.room_id])
+        token = (await self.async_client.get(url)).json()['token']
+        # As if this poll had been routed to a worker that does not own the channel
+        views._poll_channels.pop(signing.loads(token, salt='signaling-poll')['channel'])
+
+        response = (await self.async_client.get(url, {'token': token})).json()
+        self.assertNotEqual(response['token'], token)
+        self.assertEqual(response['messages'][0]['type'], 'presence')
+
+    async def test_invalid_bodies_are_rejected(self):
+        await self.async_client.aforce_login(self.creator)
+        url = reverse('send_offer', args=[self.room.room_id])
+        for body in ([], {'type': ['webrtc.offer']}, {'offer': {'type': 'offer'}},
+                     {'type': 'ice_candidate', 'candidate': 'candidate:0'}):
+            with self.subTest(body=body):
+                response = await self.async_client.post(url, data=json.dumps(body), content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+
+    async def test_outsider_cannot_signal(self):
+        await self.async_client.aforce_login(self.outsider)
+        response = await self.async_client.post(
+            reverse('send_offer', args=[self.room.room_id]),
+            data={'offer': {'type': 'offer', 'sdp': 'v=0'}},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class RoomMembershipCacheTests(TestCase):
+    def setUp(self):
+        self.creator = CustomUser.objects.create_user('creator')
+        self.receiver = CustomUser.objects.create_user('receiver')
+        self.room = Room.objects.create(room_id='room_cache', creator=self.creator, receiver=self.receiver)
+        get_room_membership().cache.delete(get_room_membership().key(self.room.room_id))
+
+    async def cached(self):
+        return await get_room_membership().aget(self.room.room_id)
+
+    async def test_views_keep_membership_current(self):
+        await self.async_client.aforce_login(self.receiver)
+        await self.async_client.post(reverse('accept_room', args=[self.room.room_id]))
+        entry = await self.cached()
+        self.assertTrue(entry['is_accepted'])
+        self.assertEqual(entry['receiver_id'], self.receiver.id)
+
+        await self.async_client.get(reverse('end_room', args=[self.room.room_id]))
+        self.assertFalse((await self.cached())['is_active'])
+
+
+    def test_process_local_cache_is_short_lived_and_flagged(self):
+        membership = RoomMembershipCache('default', ttl=300, local_ttl=5)
+        self.assertTrue(membership.is_process_local)
+        self.assertEqual(membership.entry_ttl, 5)
+        self.assertEqual([warning.id for warning in check_room_cache(None)], ['app.W001'])
+
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(RoomMembershipCache('default', ttl=300, local_ttl=5).entry_ttl, 300)
+            self.assertEqual(check_room_cache(None), [])
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class DashboardNotificationTests(TestCase):
+    def setUp(self):
+        self.creator = CustomUser.objects.create_user('creator')
+        self.receiver = CustomUser.objects.create_user('receiver')
+
+    async def subscribe(self, user):
+        channel_layer = get_channel_layer()
+        channel = await channel_layer.new_channel()
+        await channel_layer.group_add(notification_group(user.id), channel)
+        return channel
+
+    async def next_delta(self, channel):
+        event = await asyncio.wait_for(get_channel_layer().receive(channel), 1)
+        self.assertEqual(event['type'], 'dashboard_event')
+        return json.loads(event['frame'])
+
+    async def test_invitation_and_state_changes_are_pushed(self):
+        creator_channel = await self.subscribe(self.creator)
+        receiver_channel = await self.subscribe(self.receiver)
+
+        await self.async_client.aforce_login(self.creator)
+        response = await self.async_client.post(
+            reverse('create_room'),
+            data={'receiver_id': self.receiver.user_id},
+            content_type='application/json'
+        )
+        room_id = response.json()['room_id']
+        self.assertEqual(await self.next_delta(receiver_channel), {
+            'event': 'invitation', 'room_id': room_id, 'creator': 'creator'
+        })
+
+        await self.async_client.aforce_login(self.receiver)
+        await self.async_client.post(reverse('accept_room', args=[room_id]))
+        expected = {'event': 'room_state', 'room_id': room_id, 'is_active': True, 'is_accepted': True}
+        self.assertEqual(await self.next_delta(creator_channel), expected)
+        self.assertEqual(await self.next_delta(receiver_channel), expected)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class RoomConsumerTests(TestCase):
+    def setUp(self):
+        self.creator = CustomUser.objects.create_user('creator')
+        self.receiver = CustomUser.objects.create_user('receiver')
+        self.outsider = CustomUser.objects.create_user('outsider')
+        self.room = Room.objects.create(
+            room_id='room_consumer', creator=self.creator, receiver=self.receiver, is_accepted=True
+        )
+        # Signaling replay and presence must not leak from one test's room into the next
+        get_signaling_state().cache.clear()
+        get_room_membership().store(self.room)
+        self.backend = RecordingBackend()
+        for patcher in (
+            mock.patch.object(presence, '_memory_registry', presence.MemoryPresenceRegistry()),
+            mock.patch.object(input_backends, '_input_available', True),
+            mock.patch.object(input_backends, '_input_backend', self.backend),
+            mock.patch.object(consumers, '_injector', InputInjector(consumers.process_screen_data)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def connect(self, user, subprotocols=None):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f'/ws/room/{self.room.room_id}/', subprotocols=subprotocols
+        )
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        return connected, communicator
+
+    async def test_offer_reaches_peer(self):
+        _, creator = await self.connect(self.creator)
+        self.assertEqual((await creator.receive_json_from())['type'], 'presence')
+        _, receiver = await self.connect(self.receiver)
+        snapshot = await receiver.receive_json_from()
+        self.assertEqual([member['role'] for member in snapshot['members']], ['creator', 'receiver'])
+        self.assertEqual((await creator.receive_json_from())['type'], 'user_connected')
+
+        await creator.send_json_to({'type': 'webrtc.offer', 'offer': {'type': 'offer', 'sdp': 'v=0'}})
+        message = await receiver.receive_json_from()
+        self.assertEqual(message['offer']['sdp'], 'v=0')
+        self.assertEqual(message['sender_id'], self.creator.user_id)
+        self.assertTrue(await creator.receive_nothing())
+
+        await creator.disconnect()
+        self.assertEqual((await receiver.receive_json_from())['type'], 'user_disconnected')
+        await receiver.disconnect()
+
+    async def connect_pair(self):
+        """
+        Connect creator and receiver and drain the presence messages each one gets
+        """
+        _, creator = await self.connect(self.creator)
+        self.assertEqual((await creator.receive_json_from())['type'], 'presence')
+        _, receiver = await self.connect(self.receiver)
+        self.assertEqual((await receiver.receive_json_from())['type'], 'presence')
+        self.assertEqual((await creator.receive_json_from())['type'], 'user_connected')
+        return creator, receiver
+
+    @staticmethod
+    def candidate(port):
+        return {'candidate': f'candidate:1 1 udp 2122260223 192.168.1.2 {port} typ host', 'sdpMid': '0', 'sdpMLineIndex': 0}
+
+    async def test_ice_candidates_are_batched_and_deduplicated(self):
+        creator, receiver = await self.connect_pair()
+        for port in (50000, 50001, 50000):
+            await creator.send_json_to({'type': 'ice_candidate', 'candidate': self.candidate(port)})
+
+        message = await receiver.receive_json_from()
+        self.assertEqual(message['type'], 'ice_candidates')
+        self.assertEqual(message['candidates'], [self.candidate(50000), self.candidate(50001)])
+        self.assertFalse(message['end_of_candidates'])
+        self.assertEqual(message['sender_id'], self.creator.user_id)
+        self.assertTrue(await receiver.receive_nothing())
+        self.assertTrue(await creator.receive_nothing())
+        await creator.disconnect()
+        await receiver.disconnect()
+
+    @override_settings(REMOTE_ICE_BATCH_WINDOW=60)
+    async def test_end_of_candidates_flushes_at_once(self):
+        creator, receiver = await self.connect_pair()
+        await creator.send_json_to({'type': 'ice_candidate', 'candidate': self.candidate(50000)})
+        self.assertTrue(await receiver.receive_nothing())
+
+        await creator.send_json_to({'type': 'ice_candidate', 'candidate': None})
+        message = await receiver.receive_json_from()
+        self.assertEqual(message['type'], 'ice_candidates')
+        self.assertEqual(message['candidates'], [self.candidate(50000)])
+        self.assertTrue(message['end_of_candidates'])
+        await creator.disconnect()
+        await receiver.disconnect()
+
+    @override_settings(REMOTE_ICE_BATCH_WINDOW=60)
+    async def test_pending_candidates_are_flushed_before_description(self):
+        creator, receiver = await self.connect_pair()
+        for message_type, description in (('webrtc.offer', 'offer'), ('webrtc.answer', 'answer')):
+            await creator.send_json_to({'type': 'ice_candidate', 'candidate': self.candidate(50000)})
+            await creator.send_json_to({'type': message_type, description: {'type': description, 'sdp': 'v=0'}})
+
+            first = await receiver.receive_json_from()
+            self.assertEqual(first['type'], 'ice_candidates')
+            self.assertEqual(first['candidates'], [self.candidate(50000)])
+            self.assertEqual((await receiver.receive_json_from())['type'], message_type)
+        await creator.disconnect()
+        await receiver.disconnect()
+
+    @override_settings(REMOTE_ICE_BATCH_WINDOW=60)
+    async def test_answer_starts_fresh_candidate_dedup(self):
+        creator, receiver = await self.connect_pair()
+        for _ in range(2):
+            await receiver.send_json_to({'type': 'ice_candidate', 'candidate': self.candidate(50000)})
+            await receiver.send_json_to({'type': 'webrtc.answer', 'answer': {'type': 'answer', 'sdp': 'v=0'}})
+            message = await creator.receive_json_from()
+            self.assertEqual(message['type'], 'ice_candidates')
+            self.assertEqual(message['candidates'], [self.candidate(50000)])
+            self.assertEqual((await creator.receive_json_from())['type'], 'webrtc.answer')
+        await creator.disconnect()
+        await receiver.disconnect()
+
+    @override_settings(REMOTE_ICE_BATCH_WINDOW=60)
+    async def test_disconnect_flushes_pending_candidates(self):
+        creator, receiver = await self.connect_pair()
+        await creator.send_json_to({'type': 'ice_candidate', 'candidate': self.candidate(50000)})
+        self.assertTrue(await receiver.receive_nothing())
+        await creator.disconnect()
+
+        message = await receiver.receive_json_from()
+        self.assertEqual(message['type'], 'ice_candidates')
+        self.assertEqual(message['candidates'], [self.candidate(50000)])
+        self.assertEqual((await receiver.receive_json_from())['type'], 'user_disconnected')
+        await receiver.disconnect()
+
+    async def observe_room(self):
+        """
+        A bare channel in the room group, to see what is sent with group_send
+        """
+        channel_layer = get_channel_layer()
+        observer = await channel_layer.new_channel()
+        await channel_layer.group_add(self.room.room_id, observer)
+        return channel_layer, observer
+
+    async def test_send_to_peer_switches_from_group_to_peer_channel(self):
+        channel_layer, observer = await self.observe_room()
+        offer = {'type': 'webrtc.offer', 'offer': {'type': 'offer', 'sdp': 'v=0'}}
+        _, creator = await self.connect(self.creator)
+        self.assertEqual((await creator.receive_json_from())['type'], 'presence')
+
+        # Alone in the room: the offer goes to the group
+        await creator.send_json_to(offer)
+        self.assertEqual((await asyncio.wait_for(channel_layer.receive(observer), 1))['type'], 'webrtc.offer')
+
+        _, receiver = await self.connect(self.receiver)
+        self.assertEqual((await receiver.receive_json_from())['type'], 'presence')
+        self.assertEqual((await creator.receive_json_from())['type'], 'user_connected')
+
+        # Once the peer is known the offer goes to its channel only
+        await creator.send_json_to(offer)
+        self.assertEqual((await receiver.receive_json_from())['type'], 'webrtc.offer')
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(channel_layer.receive(observer), 0.1)
+        await creator.disconnect()
+        await receiver.disconnect()
+
+    async def test_sender_does_not_receive_own_group_message(self):
+        channel_layer, observer = await self.observe_room()
+        _, creator = await self.connect(self.creator)
+        self.assertEqual((await creator.receive_json_from())['type'], 'presence')
+
+        await creator.send_json_to({'type': 'webrtc.offer', 'offer': {'type': 'offer', 'sdp': 'v=0'}})
+        await creator.send_json_to({'type': 'ice_candidate', 'candidate': None})
+        for message_type in ('webrtc.offer', 'ice_candidates'):
+            self.assertEqual((await asyncio.wait_for(channel_layer.receive(observer), 1))['type'], message_type)
+        self.assertTrue(await creator.receive_nothing())
+        await creator.disconnect()
+
+    async def test_user_disconnected_resets_peer_channel(self):
+        creator, receiver = await self.connect_pair()
+        channel_layer, observer = await self.observe_room()
+        await receiver.disconnect()
+        self.assertEqual((await creator.receive_json_from())['type'], 'user_disconnected')
+
+        await creator.send_json_to({'type': 'webrtc.offer', 'offer': {'type': 'offer', 'sdp': 'v=0'}})
+        self.assertEqual((await asyncio.wait_for(channel_layer.receive(observer), 1))['type'], 'webrtc.offer')
+        await creator.disconnect()
+
+    async def test_expired_peer_channel_falls_back_to_group(self):
+        registry = presence.MemoryPresenceRegistry(ttl=0.3)
+        with mock.patch.object(presence, '_memory_registry', registry):
+            channel_layer = get_channel_layer()
+            await registry.join(self.room.room_id, 'receiver', self.receiver.user_id, 'http-signaling.poller')
+            _, creator = await self.connect(self.creator)
+            self.assertEqual((await creator.receive_json_from())['type'], 'presence')
+
+            self.assertEqual((await channel_layer.receive('http-signaling.poller'))['type'], 'user_connected')
+
+            offer = {'type': 'webrtc.offer', 'offer': {'type': 'offer', 'sdp': 'v=0'}}
+            await creator.send_json_to(offer)
+            self.assertEqual((await channel_layer.receive('http-signaling.poller'))['type'], 'webrtc.offer')
+
+            # The poller stops polling; once its entry expires the group is used again
+            observer = await channel_layer.new_channel()
+            await channel_layer.group_add(self.room.room_id, observer)
+            await asyncio.sleep(0.5)
+            await creator.send_json_to(offer)
+            event = await asyncio.wait_for(channel_layer.receive(observer), 1)
+            self.assertEqual(event['type'], 'webrtc.offer')
+            await creator.disconnect()
+
+    async def test_input_is_injected(self):
+        _, creator = await self.connect(self.creator)
+        events = [{'type': 'keyboard', 'action': 'down', 'key': 'a'}, {'type': 'keyboard', 'action': 'up', 'key': 'a'}]
+        for data in events:
+            await creator.send_json_to({'type': 'screen_data', 'data': data})
+        for _ in range(100):
+            if len(self.backend.events) == len(events):
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual([data for _, data in self.backend.events], events)
+        await creator.disconnect()
+
+    async def test_invalid_messages_are_counted_not_forwarded(self):
+        _, creator = await self.connect(self.creator)
+        _, receiver = await self.connect(self.receiver)
+        self.assertEqual((await receiver.receive_json_from())['type'], 'presence')
+        before = metrics.rejected_messages.samples()
+
+        await creator.send_to(text_data='not json')
+        await creator.send_json_to({'type': 'junk'})
+        await creator.send_json_to({'type': 'room_state', 'is_active': False})
+        await creator.send_json_to({'type': 'webrtc.offer', 'offer': {'type': 'offer'}})
+        await creator.send_json_to({'type': 'screen_data', 'data': {'type': 'batch', 'events': []}})
+        self.assertTrue(await receiver.receive_nothing())
+        self.assertEqual(self.backend.events, [])
+
+        after = metrics.rejected_messages.samples()
+        for key in (('other', 'malformed'), ('other', 'unknown_type'), ('other', 'server_only'),
+                    ('webrtc.offer', 'invalid'), ('screen_data', 'invalid')):
+            self.assertEqual(after.get(key, 0) - before.get(key, 0), 1, key)
+        await creator.disconnect()
+        await receiver.disconnect()
+
+    @override_settings(REMOTE_RATE_LIMITS={'key': (0.001, 2)}, REMOTE_RATE_LIMIT_CLOSE_AFTER=2)
+    async def test_flooding_client_is_throttled_then_closed(self):
+        _, creator = await self.connect(self.creator)
+        self.assertEqual((await creator.receive_json_from())['type'], 'presence')
+        for n in range(3):
+            await creator.send_json_to({'type': 'screen_data', 'data': {'type': 'keyboard', 'action': 'down', 'key': 'a'}})
+        notice = await creator.receive_json_from()
+        self.assertEqual(notice['type'], 'throttled')
+        self.assertEqual(notice['class'], 'key')
+
+        await creator.send_json_to({'type': 'screen_data', 'data': {'type': 'keyboard', 'action': 'up', 'key': 'a'}})
+        self.assertTrue(await creator.receive_nothing())
+        await creator.send_json_to({'type': 'screen_data', 'data': {'type': 'keyboard', 'action': 'up', 'key': 'a'}})
+        self.assertEqual(await creator.receive_output(), {'type': 'websocket.close', 'code': rate_limit.CLOSE_CODE})
+        self.assertEqual(len(self.backend.events), 2)
+        await creator.disconnect()
+
+    @override_settings(REMOTE_RATE_LIMITS={'signaling': (1, 2)}, REMOTE_RATE_LIMIT_CLOSE_AFTER=5)
+    async def test_empty_batches_are_rate_limited(self):
+        for send in (
+            lambda communicator: communicator.send_json_to({'type': 'screen_data_batch', 'events': []}),
+            lambda communicator: communicator.send_to(bytes_data=bytes([protocol.PROTOCOL_VERSION, protocol.OP_BATCH, 0, 0])),
+        ):
+            _, communicator = await self.connect(self.creator, [protocol.SUBPROTOCOL])
+            await communicator.receive_json_from()  # input protocol
+            await communicator.receive_json_from()  # presence
+            for _ in range(10):
+                await send(communicator)
+            self.assertEqual((await communicator.receive_json_from())['type'], 'throttled')
+            self.assertEqual(await communicator.receive_output(), {'type': 'websocket.close', 'code': rate_limit.CLOSE_CODE})
+            await communicator.disconnect()
+
+    @override_settings(REMOTE_INPUT_LATENCY=True)
+    async def test_input_latency_is_tracked_per_room(self):
+        get_input_latency_tracker().reset()
+        _, creator = await self.connect(self.creator)
+        await creator.send_json_to({
+            'type': 'screen_data',
+            'data': {'type': 'keyboard', 'action': 'down', 'key': 'a'},
+            'ts': time.time() * 1000
+        })
+        for _ in range(100):
+            if get_input_latency_tracker().summary():
+                break
+            await asyncio.sleep(0.01)
+        await creator.disconnect()
+
+        stages = get_input_latency_tracker().summary()[self.room.room_id]
+        for stage in STAGES:
+            self.assertEqual(stages[stage]['count'], 1, stage)
+        self.assertGreaterEqual(stages['total']['max_ms'], stages['inject']['max_ms'])
+
+    async def test_end_room_closes_connected_socket(self):
+        creator, receiver = await self.connect_pair()
+        await self.async_client.aforce_login(self.creator)
+        await self.async_client.get(reverse('end_room', args=[self.room.room_id]))
+
+        for communicator in (creator, receiver):
+            self.assertEqual((await communicator.receive_output())['type'], 'websocket.close')
+            await communicator.disconnect()
+
+    async def wait_for_events(self, count):
+        for _ in range(100):
+            if len(self.backend.events) >= count:
+                break
+            await asyncio.sleep(0.01)
+        return len(self.backend.events)
+
+    async def test_control_permission_is_recomputed_on_room_state(self):
+        key = {'type': 'screen_data', 'data': {'type': 'keyboard', 'action': 'down', 'key': 'a'}}
+        channel_layer = get_channel_layer()
+        _, receiver = await self.connect(self.receiver)
+        self.assertEqual((await receiver.receive_json_from())['type'], 'presence')
+        await receiver.send_json_to(key)
+        self.assertEqual(await self.wait_for_events(1), 1)
+
+        # A membership change alone leaves the cached permission in place
+        self.room.is_accepted = False
+        await get_room_membership().astore(self.room)
+        await receiver.send_json_to(key)
+        self.assertEqual(await self.wait_for_events(2), 2)
+
+        # room_state drops it and the next message sees the new membership
+        for is_accepted, expected in ((False, 2), (True, 3)):
+            self.room.is_accepted = is_accepted
+            await get_room_membership().astore(self.room)
+            await channel_layer.group_send(self.room.room_id, {
+                'type': 'room_state', 'room_id': self.room.room_id, 'is_active': True, 'is_accepted': is_accepted
+            })
+            # Group events and client frames arrive on separate queues; let the event land first
+            self.assertTrue(await receiver.receive_nothing())
+            await receiver.send_json_to(key)
+            self.assertTrue(await receiver.receive_nothing())
+            self.assertEqual(len(self.backend.events), expected)
+        await receiver.disconnect()
+
+    async def test_outsider_is_refused(self):
+        connected, _ = await self.connect(self.outsider)
+        self.assertFalse(connected)
+
+
+class QueryBudgetMixin:
+    """
+    Assert that a block stays within a query budget. Unlike assertNumQueries
+    this allows fewer queries, and on failure it lists every query executed.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget, using='default'):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        if len(context) > budget:
+            queries = '\n'.join(
+                f"{i}. {query['sql']}" for i, query in enumerate(context.captured_queries, start=1)
+            )
+            self.fail(f"{len(context)} queries executed, budget is {budget}:\n{queries}")
+
+
+class RoomLookupQueryTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('user')
+        self.others = [
+            CustomUser.objects.create_user(f'other{i}') for i in range(3)
+        ]
+        for i, other in enumerate(self.others):
+            Room.objects.create(room_id=f'room_pending_{i}', creator=other, receiver=self.user)
+        self.client.force_login(self.user)
+
+    def test_user_dashboard_query_count(self):
+        # session, user, pending invitations with their creators
+        with self.assertQueryBudget(3):
+            self.client.get(reverse('user_dashboard'))
+
+    def test_user_dashboard_budget_does_not_grow_with_rooms(self):
+        for i in range(10):
+            other = CustomUser.objects.create_user(f'extra{i}')
+            Room.objects.create(room_id=f'room_extra_{i}', creator=other, receiver=self.user)
+        with self.assertQueryBudget(3):
+            self.client.get(reverse('user_dashboard'))
+
+    def test_room_views_fetch_members_with_the_room(self):
+        room = Room.objects.get(room_id='room_pending_0')
+        room.is_accepted = True
+        room.save()
+        # session, user, room with creator and receiver
+        for name in ('room_router', 'controlled_dashboard'):
+            with self.subTest(view=name), self.assertQueryBudget(3):
+                self.assertEqual(self.client.get(reverse(name, args=[room.room_id])).status_code, 200)
+
+        self.client.force_login(self.others[0])
+        with self.assertQueryBudget(3):
+            self.assertEqual(
+                self.client.get(reverse('controller_dashboard', args=[room.room_id])).status_code, 200
+            )
+
+    def test_create_room_existing_room_query_count(self):
+        # session, user, receiver lookup, existing-room check
+        with self.assertNumQueries(4):
+            response = self.client.post(
+                reverse('create_room'),
+                data={'receiver_id': self.others[0].user_id},
+                content_type='application/json'
+            )
+        self.assertEqual(response.json()['room_id'], 'room_pending_0')
+
+    @skipUnless(connection.vendor == 'sqlite', 'plan text is backend specific')
+    def test_room_lookups_use_indexes(self):
+        plans = {
+            'room_pending_receiver_idx': Room.objects.filter(
+                receiver=self.user, is_active=True, is_accepted=False
+            ).order_by('-created_at'),
+            'room_receiver_state_idx': Room.objects.filter(
+                Q(creator=self.user) | Q(receiver=self.user), is_active=True
+            ),
+            'room_active_pair_idx': Room.objects.filter(
+                Q(creator=self.user, receiver=self.others[0], is_active=True) |
+                Q(creator=self.others[0], receiver=self.user, is_active=True)
+            ),
+        }
+        for index, queryset in plans.items():
+            self.assertIn(index, queryset.explain())
+
+
+class UserDirectoryTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('admin', user_type='super_user')
+        self.users = [CustomUser.objects.create_user(f'user{i}') for i in range(5)]
+        self.client.force_login(self.admin)
+
+    def fetch(self, **params):
+        return self.client.get(reverse('superuser_users'), params).json()
+
+    @mock.patch('app.views.USER_DIRECTORY_PAGE_SIZE', 2)
+    def test_pages_follow_the_cursor(self):
+        usernames = []
+        params = {}
+        while True:
+            page = self.fetch(**params)
+            usernames += [user['username'] for user in page['users']]
+            if not page['next']:
+                break
+            params = {'after': page['next']}
+        self.assertEqual(usernames, [f'user{i}' for i in range(5)])
+
+    def test_search_by_username_and_user_id_prefix(self):
+        self.assertEqual([user['username'] for user in self.fetch(q='user3')['users']], ['user3'])
+        target = self.users[2]
+        found = self.fetch(q=target.user_id[:9])['users']
+        self.assertIn(target.user_id, [user['user_id'] for user in found])
+        self.assertNotIn('admin', [user['username'] for user in self.fetch(q='a')['users']])
+
+    def test_directory_query_count(self):
+        for i in range(20):
+            CustomUser.objects.create_user(f'extra{i}')
+        # session, user, one page of users
+        with self.assertQueryBudget(3):
+            self.assertEqual(self.client.get(reverse('superuser_dashboard')).status_code, 200)
+        with self.assertQueryBudget(3):
+            self.fetch(q='extra', after='extra1')
+
+    def test_regular_users_are_denied(self):
+        self.client.force_login(self.users[0])
+        self.assertEqual(self.client.get(reverse('superuser_users')).status_code, 403)
+
+
+class UserIdAllocationTests(TestCase):
+    def test_permutation_is_collision_free(self):
+        values = [permute(value) for value in range(5000)]
+        self.assertEqual(len(set(values)), len(values))
+        self.assertTrue(all(0 <= value < USER_ID_SPACE for value in values))
+
+    def test_users_get_distinct_ten_digit_ids(self):
+        users = [CustomUser.objects.create_user(f'user{i}') for i in range(20)]
+        user_ids = {user.user_id for user in users}
+        self.assertEqual(len(user_ids), len(users))
+        self.assertTrue(all(len(user_id) == 10 and int(user_id) >= USER_ID_MIN for user_id in user_ids))
+
+    def test_collision_with_legacy_id_is_retried(self):
+        CustomUser.objects.create_user('first')
+        next_value = UserIdSequence.objects.get(pk=1).value + 1
+        legacy = CustomUser.objects.create_user('legacy', user_id=user_id_for(next_value))
+
+        user = CustomUser.objects.create_user('second')
+        self.assertNotEqual(user.user_id, legacy.user_id)
+        self.assertEqual(user.user_id, user_id_for(next_value + 1))
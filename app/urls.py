@@ -5,6 +5,9 @@ urlpatterns = [
     path('', views.login_view, name='login'),
     path('superuser/', views.superuser_dashboard, name='superuser_dashboard'),
     path('superuser/create-user/', views.create_user, name='create_user'),
+    path('superuser/users/', views.superuser_users, name='superuser_users'),
+    path('superuser/input-latency/', views.input_latency, name='input_latency'),
+    path('metrics', views.metrics, name='metrics'),
     path('dashboard/', views.user_dashboard, name='user_dashboard'),
     path('room/<str:room_id>/', views.room_router, name='room_router'),
     path('create_room/', views.create_room, name='create_room'),
@@ -13,6 +16,7 @@ urlpatterns = [
     path('accept_room/<str:room_id>/', views.accept_room, name='accept_room'),
     path('reject-room/<str:room_id>/', views.reject_room, name='reject_room'),
     path('send-offer/<str:room_id>/', views.send_offer, name='send_offer'),
+    path('signaling/<str:room_id>/poll/', views.poll_signaling, name='poll_signaling'),
     path('room/<str:room_id>/control/', views.controller_dashboard, name='controller_dashboard'),
     path('room/<str:room_id>/controlled/', views.controlled_dashboard, name='controlled_dashboard'),
 ]
\ No newline at end of file
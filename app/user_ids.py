@@ -0,0 +1,85 @@
+"""
+Allocation of the public 10-digit CustomUser.user_id.
+
+Ids come from a monotonically increasing sequence pushed through a keyed
+Feistel permutation of the 10-digit range, so they look random but two
+sequence values can never map to the same id. Allocating therefore needs no
+"is this id taken?" query before the insert.
+
+On PostgreSQL the sequence is a native SEQUENCE (see migration 0004); other
+backends use the single-row UserIdSequence counter table.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+
+USER_ID_MIN = 1000000000
+USER_ID_SPACE = 9000000000
+SEQUENCE_NAME = 'app_customuser_user_id_seq'
+
+# Balanced Feistel network over 34 bits, the smallest even width covering USER_ID_SPACE
+HALF_BITS = 17
+HALF_MASK = (1 << HALF_BITS) - 1
+ROUNDS = 4
+
+
+def _round_keys():
+    key = getattr(settings, 'USER_ID_PERMUTATION_KEY', settings.SECRET_KEY).encode()
+    return [
+        hashlib.blake2b(f'user-id-round-{i}'.encode(), key=key[:64], digest_size=32).digest()
+        for i in range(ROUNDS)
+    ]
+
+
+def _round(key, value):
+    digest = hashlib.blake2b(value.to_bytes(3, 'big'), key=key, digest_size=3).digest()
+    return int.from_bytes(digest, 'big') & HALF_MASK
+
+
+def permute(value, keys=None):
+    """
+    Map 0 <= value < USER_ID_SPACE to a unique value in the same range.
+    Cycle-walking keeps outputs of the 34-bit network inside the range.
+    """
+    if not 0 <= value < USER_ID_SPACE:
+        raise ValueError(f"{value} is outside the user id space")
+    keys = keys or _round_keys()
+    while True:
+        left, right = value >> HALF_BITS, value & HALF_MASK
+        for key in keys:
+            left, right = right, left ^ _round(key, right)
+        value = (left << HALF_BITS) | right
+        if value < USER_ID_SPACE:
+            return value
+
+
+def user_id_for(sequence_value, keys=None):
+    """
+    Turn a 1-based sequence value into its 10-digit user id
+    """
+    return str(USER_ID_MIN + permute((sequence_value - 1) % USER_ID_SPACE, keys))
+
+
+def next_sequence_values(count, using='default'):
+    """
+    Reserve `count` consecutive sequence values in one round trip
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s) FROM generate_series(1, %s)', [SEQUENCE_NAME, count])
+            return [row[0] for row in cursor.fetchall()]
+
+    from .models import UserIdSequence
+    with transaction.atomic(using=using):
+        if not UserIdSequence.objects.using(using).filter(pk=1).update(value=F('value') + count):
+            UserIdSequence.objects.using(using).create(pk=1, value=count)
+        end = UserIdSequence.objects.using(using).values_list('value', flat=True).get(pk=1)
+    return list(range(end - count + 1, end + 1))
+
+
+def allocate_user_ids(count, using='default'):
+    keys = _round_keys()
+    return [user_id_for(value, keys) for value in next_sequence_values(count, using)]
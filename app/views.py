@@ -1,21 +1,65 @@
-import json
-from django.http import JsonResponse
+import asyncio
+import math
+import time
+import uuid
+from django.conf import settings
+from django.core import signing
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from . import codec, metrics as remote_metrics
+from .client_messages import VALIDATORS, InvalidMessage
+from .codec import JsonResponse
 from .models import CustomUser, Room
 from .forms import UserCreationForm
+from .input_latency import get_input_latency_tracker
+from .notifications import notify_users, publish_dashboard_event
+from .presence import get_presence_registry, presence_snapshot
+from .room_cache import get_room_membership
+from .signaling import encode_envelope, envelope_frame, get_signaling_state
 from django.contrib.auth import get_user_model
 from django.db.models import Q 
 from django.views.decorators.csrf import ensure_csrf_cookie
 from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
 import logging
 logger = logging.getLogger(__name__)
 
 
 User = get_user_model()
 
+
+def notify_room_state(room):
+    """
+    Publish a room state change: refresh the room membership cache, tell
+    connected RoomConsumers to drop their cached control permission and push
+    the new state to both members' dashboards.
+    """
+    get_room_membership().store(room)
+    state = {
+        'room_id': room.room_id,
+        'is_active': room.is_active,
+        'is_accepted': room.is_accepted
+    }
+
+    async def publish():
+        channel_layer = get_channel_layer()
+        with remote_metrics.channel_layer_seconds.time(operation='group_send'):
+            await asyncio.gather(
+                channel_layer.group_send(room.room_id, {'type': 'room_state', **state}),
+                publish_dashboard_event(
+                    channel_layer, [room.creator_id, room.receiver_id], {'event': 'room_state', **state}
+                )
+            )
+
+    try:
+        async_to_sync(publish)()
+    except Exception as e:
+        remote_metrics.errors.inc(where='notify_room_state')
+        logger.error(f"Error notifying room {room.room_id} of state change: {str(e)}")
+
 def login_view(request):
     """
     Handle user login with support for both regular and super users.
@@ -71,13 +115,105 @@ def login_view(request):
     # GET request - show login form
     return render(request, 'login.html')
 
+USER_DIRECTORY_PAGE_SIZE = 50
+USER_DIRECTORY_FIELDS = ('id', 'username', 'user_id', 'email', 'date_joined')
+
+
+def user_directory_page(request):
+    """
+    One keyset-paginated page of the regular user directory.
+
+    A query of digits is a prefix search on user_id, anything else on
+    username; results are ordered by that field and `after` is the last value
+    of the previous page, so every page is a single index range scan no
+    matter how deep it is.
+    """
+    query = request.GET.get('q', '').strip()
+    after = request.GET.get('after', '')
+    field = 'user_id' if query.isdigit() else 'username'
+
+    users = User.objects.filter(user_type='regular_user').only(*USER_DIRECTORY_FIELDS)
+    if query:
+        users = users.filter(**{f'{field}__startswith': query})
+    if after:
+        users = users.filter(**{f'{field}__gt': after})
+    users = list(users.order_by(field)[:USER_DIRECTORY_PAGE_SIZE + 1])
+
+    next_cursor = None
+    if len(users) > USER_DIRECTORY_PAGE_SIZE:
+        users = users[:USER_DIRECTORY_PAGE_SIZE]
+        next_cursor = getattr(users[-1], field)
+    return users, query, next_cursor
+
+
 @login_required
 def superuser_dashboard(request):
     if not hasattr(request.user, 'user_type') or request.user.user_type != 'super_user':
         return redirect('user_dashboard')
     
-    users = User.objects.filter(user_type='regular_user')
-    return render(request, 'superuser/dashboard.html', {'users': users})
+    users, query, next_cursor = user_directory_page(request)
+    return render(request, 'superuser/dashboard.html', {
+        'users': users,
+        'query': query,
+        'next_cursor': next_cursor
+    })
+
+
+@login_required
+def superuser_users(request):
+    """
+    JSON variant of the user directory for incremental loading
+    """
+    if request.user.user_type != 'super_user':
+        return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+
+    users, query, next_cursor = user_directory_page(request)
+    return JsonResponse({
+        'success': True,
+        'users': [
+            {
+                'username': user.username,
+                'user_id': user.user_id,
+                'email': user.email,
+                'date_joined': user.date_joined.isoformat()
+            }
+            for user in users
+        ],
+        'next': next_cursor
+    })
+
+@login_required
+def input_latency(request):
+    """
+    Per-room input latency histograms of this worker process, optionally for one ?room=
+    """
+    if request.user.user_type != 'super_user':
+        return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+
+    tracker = get_input_latency_tracker()
+    if tracker is None:
+        return JsonResponse({'success': True, 'enabled': False, 'rooms': {}})
+    return JsonResponse({
+        'success': True,
+        'enabled': True,
+        'rooms': tracker.summary(request.GET.get('room'))
+    })
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint: this worker's metrics merged with those published by the others.
+    Scrapers authenticate with REMOTE_METRICS_TOKEN; without one only superusers may read it.
+    """
+    token = getattr(settings, 'REMOTE_METRICS_TOKEN', None)
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    elif not (request.user.is_authenticated and request.user.user_type == 'super_user'):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(
+        remote_metrics.render(remote_metrics.get_publisher().collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
 
 @login_required
 def create_user(request):
@@ -105,7 +241,7 @@ def controller_dashboard(request, room_id):
     """
     try:
         # Get room and verify user is the creator
-        room = get_object_or_404(Room, 
+        room = get_object_or_404(Room.objects.select_related('receiver'),
                                room_id=room_id, 
                                creator=request.user,
                                is_active=True,
@@ -132,7 +268,7 @@ def controlled_dashboard(request, room_id):
     """
     try:
         # Get room and verify user is the receiver
-        room = get_object_or_404(Room, 
+        room = get_object_or_404(Room.objects.select_related('creator'),
                                room_id=room_id, 
                                receiver=request.user,
                                is_active=True,
@@ -158,10 +294,14 @@ def room_router(request, room_id):
     Routes users to appropriate dashboard based on their role in the room
     """
     try:
-        room = get_object_or_404(Room, room_id=room_id, is_active=True)
+        room = get_object_or_404(
+            Room.objects.select_related('creator', 'receiver'),
+            room_id=room_id,
+            is_active=True
+        )
         
         # Verify user has access to this room
-        if request.user not in [room.creator, room.receiver]:
+        if request.user.id not in [room.creator_id, room.receiver_id]:
             messages.error(request, 'Access denied.')
             return redirect('user_dashboard')
         
@@ -200,13 +340,13 @@ def user_dashboard(request):
     active_rooms = Room.objects.filter(
         (Q(creator=request.user) | Q(receiver=request.user)),
         is_active=True
-    )
+    ).select_related('creator', 'receiver')
     
     pending_invitations = Room.objects.filter(
         receiver=request.user,
         is_active=True,
         is_accepted=False
-    )
+    ).select_related('creator', 'receiver').order_by('-created_at')
     
     return render(request, 'common_dashboard.html', {
         'active_rooms': active_rooms,
@@ -216,6 +356,7 @@ def user_dashboard(request):
 
 
 @login_required
+@remote_metrics.timed_view('create_room')
 def create_room(request):
     """
     Create a new room between two users.
@@ -228,7 +369,7 @@ def create_room(request):
         }, status=405)
 
     try:
-        data = json.loads(request.body)
+        data = codec.loads(request.body)
         receiver_id = data.get('receiver_id')
 
         if not receiver_id:
@@ -266,25 +407,31 @@ def create_room(request):
             })
 
         # Create new room with unique ID
-        import uuid
         room_id = f"room_{uuid.uuid4().hex[:10]}"
         room = Room.objects.create(
             room_id=room_id,
             creator=request.user,
             receiver=receiver
         )
+        get_room_membership().store(room)
+        notify_users([receiver.id], {
+            'event': 'invitation',
+            'room_id': room.room_id,
+            'creator': request.user.username
+        })
 
         return JsonResponse({
             'success': True,
             'room_id': room.room_id
         })
 
-    except json.JSONDecodeError:
+    except codec.DecodeError:
         return JsonResponse({
             'success': False,
             'error': 'Invalid JSON data'
         }, status=400)
     except Exception as e:
+        remote_metrics.errors.inc(where='create_room')
         logger.error(f"Error creating room: {str(e)}", exc_info=True)
         return JsonResponse({
             'success': False,
@@ -295,10 +442,10 @@ def create_room(request):
 @login_required
 def room_view(request, room_id):
     try:
-        room = Room.objects.get(room_id=room_id, is_active=True)
+        room = Room.objects.select_related('creator', 'receiver').get(room_id=room_id, is_active=True)
         
         # Verify user has access to this room
-        if request.user not in [room.creator, room.receiver]:
+        if request.user.id not in [room.creator_id, room.receiver_id]:
             messages.error(request, 'Access denied.')
             return redirect('user_dashboard')
             
@@ -311,6 +458,7 @@ def room_view(request, room_id):
         return redirect('user_dashboard')
 
 @login_required
+@remote_metrics.timed_view('accept_room')
 def accept_room(request, room_id):
     """
     Handle room acceptance with proper error handling and logging
@@ -336,6 +484,7 @@ def accept_room(request, room_id):
         # Update room status
         room.is_accepted = True
         room.save()
+        notify_room_state(room)
         
         logger.info(f"Room {room_id} successfully accepted by user {request.user.username}")
         
@@ -353,6 +502,7 @@ def accept_room(request, room_id):
         }, status=404)
         
     except Exception as e:
+        remote_metrics.errors.inc(where='accept_room')
         logger.error(f"Error accepting room {room_id}: {str(e)}", exc_info=True)
         return JsonResponse({
             'success': False,
@@ -360,6 +510,7 @@ def accept_room(request, room_id):
         }, status=500)
 
 @login_required
+@remote_metrics.timed_view('reject_room')
 def reject_room(request, room_id):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Invalid method'})
@@ -373,26 +524,25 @@ def reject_room(request, room_id):
         )
         room.is_active = False
         room.save()
+        notify_room_state(room)
         return JsonResponse({'success': True})
     except Room.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Room not found'})
 
 
 @login_required
+@remote_metrics.timed_view('end_room')
 def end_room(request, room_id):
     try:
         # Only allow creator or receiver to end the room
         room = Room.objects.get(
+            Q(creator=request.user) | Q(receiver=request.user),
             room_id=room_id,
-            is_active=True,
-            creator=request.user,
-        ) | Room.objects.get(
-            room_id=room_id,
-            is_active=True,
-            receiver=request.user
+            is_active=True
         )
         room.is_active = False
         room.save()
+        notify_room_state(room)
         return redirect('user_dashboard')
     except Room.DoesNotExist:
         messages.error(request, 'Room not found or you do not have permission.')
@@ -410,34 +560,187 @@ def logout_view(request):
     logout(request)  # Logs out the user
     return redirect('login')  # Redirects to the login page (or any other page)
 
+# Signaling message types an HTTP client may publish into its room
+HTTP_SIGNALING_TYPES = {'webrtc.offer', 'webrtc.answer', 'ice_candidate', 'screen_ready'}
+SIGNALING_POLL_TOKEN_MAX_AGE = 60 * 60
+
+# Poll channels owned by this process: channel name -> monotonic time of the
+# last poll, or math.inf while a poll is waiting on it
+_poll_channels = {}
+
+
+async def expire_poll_channel(channel_layer, channel_name, room_id, role, timeout):
+    """
+    Take a poll channel out of the room group and presence once its token
+    has not been used for `timeout` seconds
+    """
+    while True:
+        last_poll = _poll_channels.get(channel_name)
+        if last_poll is None:
+            return
+        idle = time.monotonic() - last_poll
+        if idle >= timeout:
+            break
+        await asyncio.sleep(min(timeout, timeout - idle))
+    del _poll_channels[channel_name]
+    try:
+        await channel_layer.group_discard(room_id, channel_name)
+        await get_presence_registry(channel_layer).leave(room_id, role, channel_name)
+    except Exception as e:
+        remote_metrics.errors.inc(where='poll_signaling')
+        logger.error(f"Error expiring poll channel {channel_name} of room {room_id}: {str(e)}")
+
+
+async def get_signaling_room(user, room_id):
+    """
+    Single indexed lookup of an active room the user belongs to
+    """
+    return await Room.objects.filter(
+        Q(creator_id=user.id) | Q(receiver_id=user.id),
+        room_id=room_id,
+        is_active=True
+    ).only('room_id', 'creator_id', 'receiver_id').afirst()
+
+
 @login_required
-def send_offer(request, room_id):
-    if request.method == 'POST':
+async def send_offer(request, room_id):
+    """
+    HTTP signaling fallback: publish an offer (or answer/ICE candidate) into the
+    room group for clients that cannot keep a WebSocket open.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+
+    try:
+        data = codec.loads(request.body)
+    except codec.DecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON data'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'success': False, 'error': 'Invalid JSON data'}, status=400)
+
+    message_type = data.get('type', 'webrtc.offer')
+    if not isinstance(message_type, str) or message_type not in HTTP_SIGNALING_TYPES:
+        return JsonResponse({'success': False, 'error': 'Unsupported message type'}, status=400)
+    # Same checks as messages arriving over the room WebSocket
+    try:
+        VALIDATORS[message_type](data)
+    except InvalidMessage as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    user = await request.auser()
+    room = await get_signaling_room(user, room_id)
+    if room is None:
+        return JsonResponse({'success': False, 'error': 'Room not found'}, status=404)
+
+    payload = {
+        **data,
+        'type': message_type,
+        'roomId': room_id,
+        'sender_id': str(user.user_id)
+    }
+    event = encode_envelope(payload)
+    try:
+        # Record first, so an answer is never recorded ahead of its offer
+        if message_type in ('webrtc.offer', 'webrtc.answer'):
+            role = 'creator' if room.creator_id == user.id else 'receiver'
+            await get_signaling_state().record_description(room_id, role, payload, event['frame'])
+        with remote_metrics.channel_layer_seconds.time(operation='group_send'):
+            await get_channel_layer().group_send(room_id, event)
+    except Exception as e:
+        remote_metrics.errors.inc(where='send_offer')
+        logger.error(f"Error publishing {message_type} to room {room_id}: {str(e)}", exc_info=True)
+        return JsonResponse({'success': False, 'error': 'An unexpected error occurred'}, status=500)
+
+    return JsonResponse({'success': True})
+
+
+@login_required
+async def poll_signaling(request, room_id):
+    """
+    Long-poll for signaling messages addressed to the room.
+
+    The first poll creates a channel on the channel layer, joins it to the room
+    group and registers it in the presence registry like a WebSocket peer
+    would, then returns a signed token naming it. Later polls pass that token
+    back so messages that arrived between polls are still buffered on the
+    channel. Each poll waits up to REMOTE_SIGNALING_POLL_TIMEOUT seconds and
+    returns as soon as something arrives. Every poll doubles as the presence
+    heartbeat; a channel whose token goes unused for the poll timeout leaves
+    the group and presence.
+
+    The channel is a process-local ("!") one: a poll gives up on its receive
+    when it times out, and only a receive buffered in this process can be
+    cancelled without losing a message already taken off the layer. Polls of
+    one client must therefore reach the same worker (sticky routing); a token
+    that arrives at another worker is answered with a fresh channel.
+    """
+    user = await request.auser()
+    room = await get_signaling_room(user, room_id)
+    if room is None:
+        return JsonResponse({'success': False, 'error': 'Room not found'}, status=404)
+
+    channel_layer = get_channel_layer()
+    presence = get_presence_registry(channel_layer)
+    role = 'creator' if room.creator_id == user.id else 'receiver'
+    timeout = getattr(settings, 'REMOTE_SIGNALING_POLL_TIMEOUT', 20)
+    frames = []
+
+    channel_name = None
+    token = request.GET.get('token')
+    if token:
         try:
-            data = json.loads(request.body)
-            offer = data.get('offer')
-            
-            if not offer:
-                return JsonResponse({'success': False, 'error': 'Offer data is required'})
-            
-            # Save or process the offer as needed (e.g., store in the database or send it via WebSocket)
-            room = Room.objects.get(room_id=room_id)
-            
-            # Logic to send offer, for example, via WebSocket
-            channel_layer = get_channel_layer()
-            # You can send the offer to the corresponding room channel
-            channel_layer.send(
-                f"room_{room_id}",
-                {
-                    'type': 'webrtc.offer',
-                    'offer': offer
-                }
-            )
+            claims = signing.loads(token, salt='signaling-poll', max_age=SIGNALING_POLL_TOKEN_MAX_AGE)
+            if claims['room_id'] == room_id and claims['user_id'] == user.id and claims['channel'] in _poll_channels:
+                channel_name = claims['channel']
+        except signing.BadSignature:
+            pass
 
-            return JsonResponse({'success': True})
-        except json.JSONDecodeError:
-            return JsonResponse({'success': False, 'error': 'Invalid JSON data'})
-        except Room.DoesNotExist:
-            return JsonResponse({'success': False, 'error': 'Room not found'})
-    
-    return JsonResponse({'success': False, 'error': 'Invalid request method'})
\ No newline at end of file
+    # Refreshing group membership on every poll keeps it alive past the group expiry
+    if channel_name is not None:
+        _poll_channels[channel_name] = math.inf
+        await channel_layer.group_add(room_id, channel_name)
+        await presence.join(room_id, role, user.user_id, channel_name)
+    else:
+        channel_name = await channel_layer.new_channel('http-signaling.')
+        _poll_channels[channel_name] = math.inf
+        asyncio.ensure_future(expire_poll_channel(channel_layer, channel_name, room_id, role, timeout))
+        token = signing.dumps(
+            {'channel': channel_name, 'room_id': room_id, 'user_id': user.id},
+            salt='signaling-poll'
+        )
+        await channel_layer.group_add(room_id, channel_name)
+        await presence.join(room_id, role, user.user_id, channel_name)
+        members = await presence.members(room_id)
+        frames.append(codec.dumps(presence_snapshot(room_id, members)))
+        peer = members.get('receiver' if role == 'creator' else 'creator')
+        if peer is not None:
+            await channel_layer.send(peer['channel_name'], {
+                'type': 'user_connected',
+                'user_id': str(user.user_id),
+                'room_id': room_id,
+                'role': role,
+                'channel_name': channel_name
+            })
+        frames.extend(await get_signaling_state().replay_frames(room_id, role))
+
+    try:
+        while True:
+            # Wait for the first message, then only briefly for any that follow it
+            try:
+                event = await asyncio.wait_for(
+                    channel_layer.receive(channel_name),
+                    0.05 if frames else timeout
+                )
+            except asyncio.TimeoutError:
+                break
+            if str(user.user_id) in (event.get('sender_id'), event.get('user_id')):
+                continue
+            frames.append(envelope_frame(event))
+    finally:
+        if channel_name in _poll_channels:
+            _poll_channels[channel_name] = time.monotonic()
+
+    return HttpResponse(
+        '{"success": true, "token": %s, "messages": [%s]}' % (codec.dumps(token), ','.join(frames)),
+        content_type='application/json'
+    )
@@ -78,6 +78,98 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Maximum rate (per second) at which coalesced pointer moves are injected on the
+# controlled host. Button and key events are never throttled.
+REMOTE_INPUT_MOVE_RATE = 120
+
+# Input injection runs on one dedicated worker thread. When its queue is full, or
+# a move has waited longer than the max age (s), moves replaced by a later queued
+# move are dropped; the last move before a click or key is always injected.
+REMOTE_INPUT_QUEUE_SIZE = 256
+REMOTE_INPUT_MAX_MOVE_AGE = 0.25
+
+# Backend that performs OS input injection on the controlled host:
+# app.input_backends.PyAutoGUIBackend, DirectBackend (lower latency, skips
+# pyautogui's fail-safe) or RecordingBackend (in memory, for headless runs)
+REMOTE_INPUT_BACKEND = 'app.input_backends.PyAutoGUIBackend'
+
+# Set to False on signaling-only nodes. Otherwise injection is enabled when the
+# backend's capability check passes (e.g. pyautogui needs DISPLAY on Linux).
+REMOTE_INPUT_ENABLED = True
+
+# Record per-stage input latency histograms per room, served per worker process
+# at /superuser/input-latency/. When off, the input path skips all timing.
+REMOTE_INPUT_LATENCY = False
+
+# Batched input messages: 'compress' injects a batch back-to-back with runs of
+# moves collapsed, 'preserve' replays the original spacing (capped at MAX_SPAN s).
+REMOTE_INPUT_BATCH_TIMING = 'compress'
+REMOTE_INPUT_BATCH_MAX_EVENTS = 256
+REMOTE_INPUT_BATCH_MAX_SPAN = 0.25
+# Replaying a preserved batch blocks the injection thread shared by all rooms,
+# so each batch sleeps at most this long (s); later events are injected at once.
+REMOTE_INPUT_BATCH_MAX_DELAY = 0.1
+
+# Trickled ICE candidates are collected for this long (s) and forwarded as one batch
+REMOTE_ICE_BATCH_WINDOW = 0.05
+
+# Pending (unanswered) offer and its candidates per room, replayed to the answering
+# peer when it (re)joins.
+# Stored in this cache alias; point it at a Redis cache to share it between
+# ASGI workers, e.g.
+# CACHES = {
+#     "default": {
+#         "BACKEND": "django.core.cache.backends.redis.RedisCache",
+#         "LOCATION": "redis://127.0.0.1:6379/1",
+#     }
+# }
+REMOTE_SIGNALING_CACHE = 'default'
+REMOTE_SIGNALING_STATE_TTL = 120
+
+# Room membership cache used to authorize WebSocket connects without a query.
+# Views update it when rooms end, so with more than one process (a web server
+# next to the ASGI server, several ASGI workers) it must be a shared cache, e.g.
+# a Redis alias as shown for REMOTE_SIGNALING_CACHE; `check --deploy` warns
+# otherwise. A process-local memory cache (also the fallback when the alias is
+# not configured) keeps entries only LOCAL_TTL seconds, so other processes see
+# an ended room at most that late.
+REMOTE_ROOM_CACHE = 'default'
+REMOTE_ROOM_CACHE_TTL = 300
+REMOTE_ROOM_CACHE_LOCAL_TTL = 5
+
+# Longest time (s) a signaling long-poll request waits for a message. Poll
+# channels are process-local, so with several ASGI workers route each client's
+# polls to the same worker (sticky sessions). A channel whose token goes unused
+# for this long leaves its room group.
+REMOTE_SIGNALING_POLL_TIMEOUT = 20
+
+# Seconds a room presence entry stays valid without a heartbeat. Consumers
+# heartbeat every third of this; it must exceed the signaling poll timeout.
+REMOTE_PRESENCE_TTL = 45
+
+# Prometheus metrics at /metrics. Each worker publishes its snapshot to this
+# cache every PUBLISH_INTERVAL s; with a shared cache (Redis) any worker serves
+# the merged totals. Set TOKEN to let scrapers in with "Authorization: Bearer
+# <token>"; without a token only logged-in superusers can read the endpoint.
+REMOTE_METRICS_CACHE = 'default'
+REMOTE_METRICS_PUBLISH_INTERVAL = 10
+REMOTE_METRICS_TOKEN = None
+
+# Token buckets per WebSocket connection and message class as (messages per
+# second, burst). Input batches take one token per event. Over-budget messages
+# are dropped with a throttle notice; after more than CLOSE_AFTER drops within
+# a second the connection is closed with code 4429. None disables the limits.
+REMOTE_RATE_LIMITS = {
+    'pointer': (500, 1000),
+    'key': (100, 200),
+    'signaling': (20, 100),
+}
+REMOTE_RATE_LIMIT_CLOSE_AFTER = 1000
+
+# JSON codec for WebSocket frames, envelopes and JSON views: 'orjson',
+# 'msgspec' or 'json'. None picks the fastest one installed.
+REMOTE_JSON_CODEC = None
+
 CHANNEL_LAYERS_CONFIG = {
     "DEFAULT": {
         "MIDDLEWARE": [
@@ -168,6 +260,10 @@ USE_TZ = True
 
 AUTH_USER_MODEL = 'app.CustomUser'
 
+# Key of the permutation that turns the user id sequence into public 10-digit
+# user ids. Never change it once users exist, or new ids may collide.
+USER_ID_PERMUTATION_KEY = 'c1f4a7e2-user-id-permutation-5b90d3'
+
 CSRF_COOKIE_SAMESITE = 'Lax'
 SESSION_COOKIE_SAMESITE = 'Lax'
 CSRF_COOKIE_HTTPONLY = False  # False because we need to access it from JavaScript